@@ -35,6 +35,9 @@ from app.db import storage
 
 logger = logging.getLogger(__name__)
 
+# Position side for a symbol with no open quantity
+FLAT = "FLAT"
+
 
 class CapitalManager:
     """
@@ -84,11 +87,15 @@ class CapitalManager:
         self._positions: dict[str, dict[str, Any]] = {}
         db_positions = storage.get_positions(account_id)
         for p in db_positions:
-            self._positions[p["symbol"]] = {
-                "qty": p["qty"],
-                "avg_price": p["avg_price"],
-                "side": p["side"],
+            self._positions[p.symbol] = {
+                "qty": p.qty,
+                "avg_price": p.avg_price,
+                "side": p.side,
             }
+        # (version, symbols with qty > 0), replaced as one tuple on every
+        # position change; get_pnl() keys its memo on it
+        self._book: tuple[int, tuple[str, ...]] = (0, self._held_symbols())
+        self._pnl_memo: tuple[Optional[tuple], dict] = (None, {})
 
         logger.info(
             "CapitalManager restored from DB: account=%s  capital=%.2f  "
@@ -99,6 +106,9 @@ class CapitalManager:
             len(self._positions),
         )
 
+    def _held_symbols(self) -> tuple[str, ...]:
+        return tuple(sym for sym, p in self._positions.items() if p["qty"] > 0)
+
     # ------------------------------------------------------------------
     # Read-only properties
     # ------------------------------------------------------------------
@@ -115,6 +125,11 @@ class CapitalManager:
     def realised_pnl(self) -> float:
         return self._realised_pnl
 
+    @property
+    def positions_version(self) -> int:
+        """Bumped on every position change; cheap staleness check."""
+        return self._book[0]
+
     @property
     def daily_loss_halted(self) -> bool:
         return self._daily_loss_halted
@@ -176,7 +191,7 @@ class CapitalManager:
         try:
             pos = self._positions.get(symbol)
             if pos is None or pos["qty"] <= 0:
-                storage.upsert_position(symbol, "FLAT", 0, 0.0, self._account_id)
+                storage.upsert_position(symbol, FLAT, 0, 0.0, self._account_id)
             else:
                 storage.upsert_position(
                     symbol,
@@ -188,6 +203,39 @@ class CapitalManager:
         except Exception as exc:
             logger.error("Failed to persist position %s: %s", symbol, exc)
 
+    def _persist_fill(self, symbol: str, order: dict, pnl: float) -> None:
+        """Write position, capital, order and trade for a fill in one commit."""
+        pos = self._positions.get(symbol) or {"qty": 0, "avg_price": 0.0}
+        trade = {
+            "order_id": order["order_id"],
+            "account_id": self._account_id,
+            "symbol": symbol,
+            "side": order["side"],
+            "qty": order["filled_qty"],
+            "price": order["avg_price"],
+            "pnl": round(pnl, 2),
+        }
+        try:
+            storage.record_fill(
+                {
+                    "account_id": self._account_id,
+                    "available_capital": self._available_capital,
+                    "realised_pnl": self._realised_pnl,
+                },
+                {
+                    "symbol": symbol,
+                    "side": pos.get("side", FLAT),
+                    "qty": pos["qty"],
+                    "avg_price": pos["avg_price"],
+                },
+                trade,
+                order,
+            )
+        except Exception as exc:
+            logger.error("Failed to persist fill %s: %s", order["order_id"][:8], exc)
+            # Keep the per-trade audit trail even if the fill write failed
+            storage.insert_trade(trade)
+
     # ------------------------------------------------------------------
     # Capital queries
     # ------------------------------------------------------------------
@@ -213,9 +261,24 @@ class CapitalManager:
         return total
 
     def get_pnl(self, current_prices: Optional[dict[str, float]] = None) -> dict:
-        """Full P&L snapshot for the UI."""
+        """Full P&L snapshot for the UI.
+
+        Memoised on the position book version, the held symbols' prices and
+        the halt flags, so a cycle where nothing held moved skips the
+        mark-to-market.  Always returns a fresh dict the caller may extend.
+        """
+        version, held = self._book
+        key = (
+            version,
+            tuple(map(current_prices.get, held)) if current_prices else None,
+            self._daily_loss_halted,
+            self._kill_switch,
+        )
+        memo_key, memo = self._pnl_memo
+        if key == memo_key:
+            return dict(memo)
         unreal = self.unrealised_pnl(current_prices) if current_prices else 0.0
-        return {
+        pnl = {
             "realised_pnl": round(self._realised_pnl, 2),
             "unrealised_pnl": round(unreal, 2),
             "total_pnl": round(self._realised_pnl + unreal, 2),
@@ -226,6 +289,8 @@ class CapitalManager:
             "kill_switch": self._kill_switch,
             "trade_count": 0,  # filled by caller
         }
+        self._pnl_memo = (key, pnl)
+        return dict(pnl)
 
     # ------------------------------------------------------------------
     # Position management
@@ -240,16 +305,24 @@ class CapitalManager:
         with self._lock:
             return dict(
                 self._positions.get(
-                    symbol, {"qty": 0, "avg_price": 0.0, "side": "FLAT"}
+                    symbol, {"qty": 0, "avg_price": 0.0, "side": FLAT}
                 )
             )
 
     def update_position(
-        self, symbol: str, side: str, fill_qty: int, fill_price: float
+        self,
+        symbol: str,
+        side: str,
+        fill_qty: int,
+        fill_price: float,
+        order: Optional[dict] = None,
     ) -> float:
         """
         Apply a fill to the position book and persist to DB.
 
+        When the filled ``order`` is passed, its status and trade record are
+        written in the same transaction as the position and capital.
+
         Capital flow:
             - Opening/adding: reduce available_capital by fill notional
             - Closing/reducing: restore margin + pnl to available_capital
@@ -259,10 +332,10 @@ class CapitalManager:
         pnl = 0.0
         with self._lock:
             pos = self._positions.get(
-                symbol, {"qty": 0, "avg_price": 0.0, "side": "FLAT"}
+                symbol, {"qty": 0, "avg_price": 0.0, "side": FLAT}
             )
 
-            if pos["side"] == "FLAT" or pos["qty"] == 0:
+            if pos["side"] == FLAT or pos["qty"] == 0:
                 # Opening new position — lock margin
                 margin = fill_qty * fill_price
                 self._available_capital -= margin
@@ -297,7 +370,7 @@ class CapitalManager:
                         self._available_capital -= new_margin
                         pos = {"qty": remaining, "avg_price": fill_price, "side": side}
                     else:
-                        pos = {"qty": 0, "avg_price": 0.0, "side": "FLAT"}
+                        pos = {"qty": 0, "avg_price": 0.0, "side": FLAT}
                 else:
                     # Partial close
                     if pos["side"] == "BUY":
@@ -311,10 +384,14 @@ class CapitalManager:
 
             self._positions[symbol] = pos
             self._realised_pnl += pnl
+            self._book = (self._book[0] + 1, self._held_symbols())
 
             # ── PERSIST TO DB (inside lock for consistency) ──
-            self._persist_position(symbol)
-            self._persist_account()
+            if order is not None:
+                self._persist_fill(symbol, order, pnl)
+            else:
+                self._persist_position(symbol)
+                self._persist_account()
 
         logger.debug(
             "Position update: %s %s %d@%.2f → pnl=%.2f  avail=%.2f",
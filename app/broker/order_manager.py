@@ -20,29 +20,33 @@ import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Any, Callable, Optional
 
+import numpy as np
+
 from app.db import storage
 from app.utils.risk import RiskParams, position_size, stop_loss_price, take_profit_price
-from app.config import ORDER_TIMEOUT_SEC
+from app.config import get_settings
+
+
+try:
+    from app.utils.clock import EngineClock
+
+    _CLOCK: Optional[EngineClock] = EngineClock(mode="demo")
+except Exception:
+    _CLOCK = None
 
 
 def _utc_now_iso() -> str:
     """Return current UTC time as ISO 8601 string via EngineClock."""
-    try:
-        from app.utils.clock import EngineClock
-
-        return EngineClock(mode="demo").now_iso()
-    except Exception:
-        return datetime.now(timezone.utc).isoformat()
+    if _CLOCK is not None:
+        return _CLOCK.now_iso()
+    return datetime.now(timezone.utc).isoformat()
 
 
 def _utc_now_dt() -> datetime:
     """Return current UTC datetime (timezone-aware) via EngineClock."""
-    try:
-        from app.utils.clock import EngineClock
-
-        return EngineClock(mode="demo").now_utc()
-    except Exception:
-        return datetime.now(timezone.utc)
+    if _CLOCK is not None:
+        return _CLOCK.now_utc()
+    return datetime.now(timezone.utc)
 
 
 logger = logging.getLogger(__name__)
@@ -88,8 +92,19 @@ class OrderManager:
         self._capital_mgr = capital_mgr
         self._order_validator = order_validator
 
-        # Order cache: order_id -> order dict
+        # Order cache: order_id -> order dict.  A stored dict is never
+        # mutated: every change stores a new one under _lock, so readers
+        # take a snapshot of values() without the lock and always see
+        # whole orders.
         self._orders: dict[str, dict] = {}
+        # Bumped on every status transition (the only way an order enters
+        # or leaves the FILLED/PARTIAL set check_sl_tp() reads from)
+        self._orders_rev = 0
+
+        # check_sl_tp() thresholds as parallel arrays, one slot per open
+        # position; rebuilt only when positions or order states change
+        self._sl_tp_key: Optional[tuple] = None
+        self._sl_tp_book: tuple = ()
 
         # Engine stop callback (set by main.py for daily-loss halt)
         self._engine_stop_fn: Optional[Callable] = None
@@ -258,7 +273,9 @@ class OrderManager:
                     return
             except Exception as exc:
                 logger.warning("Broker submit attempt %d failed: %s", attempt, exc)
-            order["retries"] = attempt
+            with self._lock:
+                current = self._orders.get(order["order_id"], order)
+                self._orders[order["order_id"]] = {**current, "retries": attempt}
 
         logger.error(
             "Order %s failed after %d retries â€” marking REJECTED",
@@ -304,12 +321,14 @@ class OrderManager:
                 )
                 return None
 
-            order["status"] = new_status
-            order["updated_at"] = _utc_now_iso()
+            # Swap in a new dict; holders of the old one keep a whole order
+            order = {**order, "status": new_status, "updated_at": _utc_now_iso()}
             if filled_qty > 0:
                 order["filled_qty"] = filled_qty
             if avg_price > 0:
                 order["avg_price"] = avg_price
+            self._orders[order_id] = order
+            self._orders_rev += 1
 
         # Persist
         storage.update_order(
@@ -350,23 +369,23 @@ class OrderManager:
         fill_qty = order["filled_qty"]
         fill_price = order["avg_price"]
 
-        realised_pnl = 0.0
         if self._capital_mgr is not None:
-            realised_pnl = self._capital_mgr.update_position(
-                sym, side, fill_qty, fill_price
+            # Position, capital, order and trade (with PnL) in one DB commit
+            self._capital_mgr.update_position(
+                sym, side, fill_qty, fill_price, order=order
             )
-        else:
-            logger.warning("No CapitalManager â€” position tracking skipped")
+            return
 
-        # Transactional: update order + insert trade (with PnL) in one DB commit
+        logger.warning("No CapitalManager â€” position tracking skipped")
+        # Transactional: update order + insert trade in one DB commit
         trade_data = {
             "order_id": order["order_id"],
-            "account_id": getattr(self._capital_mgr, "account_id", "default"),
+            "account_id": "default",
             "symbol": sym,
             "side": side,
             "qty": fill_qty,
             "price": fill_price,
-            "pnl": round(realised_pnl, 2),
+            "pnl": 0.0,
         }
         try:
             storage.insert_order_and_trade(order, trade_data)
@@ -380,8 +399,7 @@ class OrderManager:
 
     def cancel_order(self, order_id: str) -> bool:
         """Request cancellation of an open order."""
-        with self._lock:
-            order = self._orders.get(order_id)
+        order = self._orders.get(order_id)
         if order is None:
             return False
         if order["status"] in ("NEW", "ACK", "PARTIAL"):
@@ -399,16 +417,14 @@ class OrderManager:
         return {}
 
     def get_open_orders(self) -> list[dict]:
-        with self._lock:
-            return [
-                o
-                for o in self._orders.values()
-                if o["status"] in ("NEW", "ACK", "PARTIAL")
-            ]
+        return [
+            o
+            for o in list(self._orders.values())
+            if o["status"] in ("NEW", "ACK", "PARTIAL")
+        ]
 
     def get_all_orders(self) -> list[dict]:
-        with self._lock:
-            return list(self._orders.values())
+        return list(self._orders.values())
 
     def get_pnl(self, current_prices: Optional[dict[str, float]] = None) -> dict:
         """
@@ -430,97 +446,117 @@ class OrderManager:
     # Live SL/TP enforcement (called from tick loop)
     # ------------------------------------------------------------------
 
+    def _sl_tp_arrays(self) -> tuple:
+        """Open positions with an SL/TP reference order, struct-of-arrays.
+
+        Returns ``(symbols, qtys, sides, is_buy, sl, tp)``: tuples for the
+        per-position values a closing order needs, float64/bool arrays for
+        the comparisons.  Cached until a fill or an order transition.
+        """
+        key = (self._capital_mgr.positions_version, self._orders_rev)
+        if key == self._sl_tp_key:
+            return self._sl_tp_book
+
+        positions_snapshot = {
+            sym: pos
+            for sym, pos in self._capital_mgr.get_positions().items()
+            if pos.get("qty", 0) > 0 and pos["side"] in ("BUY", "SELL")
+        }
+
+        # SL/TP from the most recent filled order for each symbol
+        sl_tp_map: dict[str, dict] = {}
+        for o in list(self._orders.values()):
+            if (
+                o["status"] in ("FILLED", "PARTIAL")
+                and o["symbol"] in positions_snapshot
+                and o.get("stop_loss")
+                and o.get("take_profit")
+            ):
+                existing = sl_tp_map.get(o["symbol"])
+                if existing is None or o["updated_at"] > existing["updated_at"]:
+                    sl_tp_map[o["symbol"]] = o
+
+        symbols = tuple(sym for sym in positions_snapshot if sym in sl_tp_map)
+        sides = tuple(positions_snapshot[sym]["side"] for sym in symbols)
+        refs = [sl_tp_map[sym] for sym in symbols]
+        book = (
+            symbols,
+            tuple(positions_snapshot[sym]["qty"] for sym in symbols),
+            sides,
+            np.array([side == "BUY" for side in sides], dtype=bool),
+            np.array([o["stop_loss"] for o in refs], dtype=float),
+            np.array([o["take_profit"] for o in refs], dtype=float),
+        )
+        self._sl_tp_key = key
+        self._sl_tp_book = book
+        return book
+
     def check_sl_tp(self, current_prices: dict[str, float]) -> list[dict]:
         """
         Check all open positions against their SL/TP prices.
         Returns list of closing orders created.
+
+        Every position is compared in one vectorised pass; the threshold
+        arrays are only rebuilt after fills and order transitions.
         """
         closing_orders = []
 
-        # Get positions from CapitalManager
-        if self._capital_mgr is not None:
-            positions_snapshot = {
-                sym: pos
-                for sym, pos in self._capital_mgr.get_positions().items()
-                if pos.get("qty", 0) > 0
-            }
-        else:
-            positions_snapshot = {}
+        if self._capital_mgr is None:
+            return closing_orders
 
-        if not positions_snapshot:
+        symbols, qtys, sides, is_buy, sl_arr, tp_arr = self._sl_tp_arrays()
+        if not symbols:
             return closing_orders
 
-        # Gather SL/TP from the most recent filled order for each symbol
-        with self._lock:
-            sl_tp_map: dict[str, dict] = {}
-            for o in self._orders.values():
-                if (
-                    o["status"] in ("FILLED", "PARTIAL")
-                    and o["symbol"] in positions_snapshot
-                    and o.get("stop_loss")
-                    and o.get("take_profit")
-                ):
-                    existing = sl_tp_map.get(o["symbol"])
-                    if existing is None or o["updated_at"] > existing["updated_at"]:
-                        sl_tp_map[o["symbol"]] = o
-
-        for sym, pos in positions_snapshot.items():
-            price = current_prices.get(sym)
-            if price is None:
-                continue
-            ref_order = sl_tp_map.get(sym)
-            if ref_order is None:
-                continue
-
-            sl = ref_order["stop_loss"]
-            tp = ref_order["take_profit"]
-            side = pos["side"]
-            hit = None
-
-            if side == "BUY":
-                if price <= sl:
-                    hit = "SL"
-                elif price >= tp:
-                    hit = "TP"
-            elif side == "SELL":
-                if price >= sl:
-                    hit = "SL"
-                elif price <= tp:
-                    hit = "TP"
-
-            if hit:
-                close_side = "SELL" if side == "BUY" else "BUY"
-                close_order = {
-                    "order_id": str(uuid.uuid4()),
-                    "symbol": sym,
-                    "side": close_side,
-                    "qty": pos["qty"],
-                    "price": price,
-                    "order_type": "MARKET",
-                    "status": "NEW",
-                    "filled_qty": 0,
-                    "avg_price": 0.0,
-                    "strategy": f"auto_{hit.lower()}_exit",
-                    "stop_loss": 0,
-                    "take_profit": 0,
-                    "created_at": _utc_now_iso(),
-                    "updated_at": _utc_now_iso(),
-                    "retries": 0,
-                }
-                with self._lock:
-                    self._orders[close_order["order_id"]] = close_order
-                storage.insert_order(close_order)
-                self._submit_with_retry(close_order)
-                closing_orders.append(close_order)
-                logger.info(
-                    "%s HIT for %s @ %.2f (SL=%.2f TP=%.2f) â€” closing %d shares",
-                    hit,
-                    sym,
-                    price,
-                    sl,
-                    tp,
-                    pos["qty"],
-                )
+        # A symbol without a price yet compares as NaN, i.e. never hits
+        prices = np.fromiter(
+            (current_prices.get(sym, np.nan) for sym in symbols),
+            dtype=float,
+            count=len(symbols),
+        )
+        sl_hit = np.where(is_buy, prices <= sl_arr, prices >= sl_arr)
+        tp_hit = np.where(is_buy, prices >= tp_arr, prices <= tp_arr) & ~sl_hit
+
+        for i in np.flatnonzero(sl_hit | tp_hit).tolist():
+            sym = symbols[i]
+            side = sides[i]
+            price = current_prices[sym]
+            sl = float(sl_arr[i])
+            tp = float(tp_arr[i])
+            hit = "SL" if sl_hit[i] else "TP"
+
+            close_side = "SELL" if side == "BUY" else "BUY"
+            close_order = {
+                "order_id": str(uuid.uuid4()),
+                "symbol": sym,
+                "side": close_side,
+                "qty": qtys[i],
+                "price": price,
+                "order_type": "MARKET",
+                "status": "NEW",
+                "filled_qty": 0,
+                "avg_price": 0.0,
+                "strategy": f"auto_{hit.lower()}_exit",
+                "stop_loss": 0,
+                "take_profit": 0,
+                "created_at": _utc_now_iso(),
+                "updated_at": _utc_now_iso(),
+                "retries": 0,
+            }
+            with self._lock:
+                self._orders[close_order["order_id"]] = close_order
+            storage.insert_order(close_order)
+            self._submit_with_retry(close_order)
+            closing_orders.append(close_order)
+            logger.info(
+                "%s HIT for %s @ %.2f (SL=%.2f TP=%.2f) â€” closing %d shares",
+                hit,
+                sym,
+                price,
+                sl,
+                tp,
+                qtys[i],
+            )
 
         return closing_orders
 
@@ -533,21 +569,22 @@ class OrderManager:
         Mark orders stuck in NEW status for longer than ORDER_TIMEOUT_SEC
         as REJECTED.  Returns count of timed-out orders.
         """
+        # Read per call so reset_settings() applies to a live manager
+        timeout_sec = get_settings().ORDER_TIMEOUT_SEC
         now = _utc_now_dt()
-        cutoff = now - timedelta(seconds=ORDER_TIMEOUT_SEC)
+        cutoff = now - timedelta(seconds=timeout_sec)
         timed_out = 0
-        with self._lock:
-            stale = [
-                o
-                for o in self._orders.values()
-                if o["status"] == "NEW" and o.get("created_at", "") < cutoff.isoformat()
-            ]
+        stale = [
+            o
+            for o in list(self._orders.values())
+            if o["status"] == "NEW" and o.get("created_at", "") < cutoff.isoformat()
+        ]
         for o in stale:
             self.update_order_status(o["order_id"], "REJECTED")
             logger.warning(
                 "Order %s timed out after %ds â€” REJECTED",
                 o["order_id"][:8],
-                ORDER_TIMEOUT_SEC,
+                timeout_sec,
             )
             timed_out += 1
         return timed_out
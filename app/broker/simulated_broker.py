@@ -4,16 +4,22 @@ app/broker/simulated_broker.py
 A simulated broker that mimics realistic order processing with configurable
 latencies, partial fills, slippage, and webhook callbacks.
 
-This module runs its own background thread to process an order queue.
+This module runs an asyncio event loop on its own background thread; every
+submitted order becomes a task on that loop, so many orders can be in flight
+at once without one OS thread per order.  After ``eventlet.monkey_patch()``
+(as in app.main) that thread is a green thread and the loop waits in the
+patched ``select``, so it yields to the SocketIO hub between timers and
+callbacks stay on the hub's OS thread.
 
 Implements the BrokerAdapter ABC for consistency with production broker integrations.
 """
 
+import asyncio
 import logging
 import random
 import threading
-import time
-from typing import Any, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, NamedTuple, Optional
 
 import requests
 
@@ -27,6 +33,49 @@ from app.config import (
 
 logger = logging.getLogger(__name__)
 
+# orjson is optional — fall back to the stdlib encoder if it isn't installed
+try:
+    import orjson
+
+    _json_dumps = orjson.dumps
+except ImportError:
+    import json
+
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class UpdateMsg(NamedTuple):
+    """Order status update passed to the ``on_update`` callback."""
+
+    order_id: str
+    status: str
+    filled_qty: int
+    avg_price: float
+
+
+def _latencies(n: int) -> list[float]:
+    """Draw ``n`` simulated exchange latencies, in seconds."""
+    return [
+        random.randint(BROKER_MIN_LATENCY_MS, BROKER_MAX_LATENCY_MS) / 1000
+        for _ in range(n)
+    ]
+
+
+def _webhook_pool() -> ThreadPoolExecutor:
+    """One worker keeps webhook posts ordered and off the event loop."""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="broker-webhook")
+
+
+async def _sleep_until(loop: asyncio.AbstractEventLoop, deadline: float) -> None:
+    """Sleep until ``deadline`` on the loop's monotonic clock."""
+    remaining = deadline - loop.time()
+    if remaining > 0:
+        await asyncio.sleep(remaining)
+
 
 class SimulatedBroker(BrokerAdapter):
     """
@@ -50,13 +99,18 @@ class SimulatedBroker(BrokerAdapter):
         self._webhook_url = (
             webhook_url or f"http://127.0.0.1:{FLASK_PORT}/webhook/order-update"
         )
-        self._queue: list[dict] = []
-        self._lock = threading.Lock()
+        # Orders submitted before start() are scheduled on the loop and run
+        # as soon as the loop thread begins serving it.
+        self._loop = asyncio.new_event_loop()
+        self._loop_lock = threading.Lock()  # guards replacing self._loop
+        self._orders_lock = threading.Lock()  # guards self._orders only
         self._running = False
         self._thread: Optional[threading.Thread] = None
         self._on_update = on_update  # optional in-process callback
         self._orders: dict[str, dict] = {}  # track orders for get_order_status
         self._connected: bool = False
+        self._session = requests.Session()  # keep-alive for webhook posts
+        self._webhook_pool = _webhook_pool()
 
     # ------------------------------------------------------------------
     # BrokerAdapter ABC implementation
@@ -66,7 +120,7 @@ class SimulatedBroker(BrokerAdapter):
         """
         Establish broker connection.
 
-        For SimulatedBroker, this starts the background processing thread.
+        For SimulatedBroker, this starts the background event loop.
         Credentials are ignored (simulation only).
         """
         if self._connected:
@@ -88,41 +142,39 @@ class SimulatedBroker(BrokerAdapter):
 
             order["order_id"] = str(uuid.uuid4())
 
-        # Track order for get_order_status
-        with self._lock:
-            self._orders[order["order_id"]] = {
-                **order,
-                "status": "NEW",
-                "filled_qty": 0,
-                "avg_price": 0.0,
-            }
+        # Track order for get_order_status (build outside the lock)
+        new_order = {
+            **order,
+            "status": "NEW",
+            "filled_qty": 0,
+            "avg_price": 0.0,
+        }
+        with self._orders_lock:
+            self._orders[order["order_id"]] = new_order
 
-        self.submit_order(order)
+        if not self.submit_order(order):
+            raise RuntimeError(
+                f"Simulated broker could not accept order {order['order_id']}"
+            )
         return order["order_id"]
 
     def cancel_order(self, broker_order_id: str) -> bool:
         """
         Cancel an order by ID.
 
-        In simulation mode, removes from queue if not yet processed.
+        In simulation mode, an order can be cancelled while it is still
+        queued (NEW) or acknowledged (ACK).  Queued orders are marked
+        CANCELLED and skipped when their task starts on the broker loop.
         """
-        with self._lock:
-            # Try to remove from pending queue
-            for i, o in enumerate(self._queue):
-                if o.get("order_id") == broker_order_id:
-                    self._queue.pop(i)
-                    if broker_order_id in self._orders:
-                        self._orders[broker_order_id]["status"] = "CANCELLED"
-                    logger.info(
-                        "Order %s cancelled (removed from queue)", broker_order_id[:8]
-                    )
-                    return True
-            # If already processing, cannot cancel
-            if broker_order_id in self._orders:
-                status = self._orders[broker_order_id].get("status", "")
-                if status in ("NEW", "ACK"):
-                    self._orders[broker_order_id]["status"] = "CANCELLED"
-                    return True
+        cancelled = False
+        with self._orders_lock:
+            order = self._orders.get(broker_order_id)
+            if order is not None and order.get("status", "") in ("NEW", "ACK"):
+                order["status"] = "CANCELLED"
+                cancelled = True
+        if cancelled:
+            logger.info("Order %s cancelled", broker_order_id[:8])
+            return True
         logger.warning(
             "Cannot cancel order %s (already processed)", broker_order_id[:8]
         )
@@ -130,7 +182,7 @@ class SimulatedBroker(BrokerAdapter):
 
     def get_order_status(self, broker_order_id: str) -> dict:
         """Return the current status of an order."""
-        with self._lock:
+        with self._orders_lock:
             order = self._orders.get(broker_order_id)
             if order:
                 return {
@@ -155,8 +207,28 @@ class SimulatedBroker(BrokerAdapter):
         return []
 
     def disconnect(self) -> None:
-        """Close the broker session."""
+        """Close the broker session and release the loop and webhook worker.
+
+        Orders still in flight are cancelled.  A later ``connect()`` starts
+        on a fresh loop and worker.
+        """
         self.stop()
+        if self._thread is None:
+            # Held until closed, so submit_order() either lands before the
+            # cancel below or on the next loop
+            with self._loop_lock:
+                loop = self._loop
+                pending = asyncio.all_tasks(loop)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    loop.run_until_complete(
+                        asyncio.gather(*pending, return_exceptions=True)
+                    )
+                loop.close()
+        # Finish queued posts; the replacement starts no thread until used
+        self._webhook_pool.shutdown(wait=True)
+        self._webhook_pool = _webhook_pool()
         self._connected = False
         logger.info("SimulatedBroker disconnected")
 
@@ -165,53 +237,103 @@ class SimulatedBroker(BrokerAdapter):
     # ------------------------------------------------------------------
 
     def start(self) -> None:
-        """Start the background processing thread."""
+        """Start the background event-loop thread."""
         if self._running:
             return
+        self._open_loop()
         self._running = True
-        self._thread = threading.Thread(target=self._process_loop, daemon=True)
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
         self._thread.start()
         logger.info("Simulated broker started")
 
     def stop(self) -> None:
+        """Stop the event loop.  In-flight orders resume on the next start()."""
+        thread = self._thread
+        # Only a live loop thread may get the stop request: queued on an
+        # idle loop, it would end the *next* start() as soon as it ran
+        if thread is not None and thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            thread.join(timeout=5)
+            if thread.is_alive():
+                logger.warning("Simulated broker loop did not stop within 5 s")
+                return
+        self._thread = None
         self._running = False
-        if self._thread:
-            self._thread.join(timeout=5)
         logger.info("Simulated broker stopped")
 
-    def submit_order(self, order: dict) -> bool:
+    def submit_order(self, order: dict, copy: bool = False) -> bool:
         """
-        Enqueue an order for processing.  Returns True immediately
+        Schedule an order for processing.  Returns True immediately
         (simulating async broker acceptance).
+
+        Orders submitted while the broker is stopped or disconnected wait
+        on the loop and run once it is started again.  Returns False, and
+        forgets the order, if it cannot be scheduled at all.
+
+        The order dict is scheduled by reference: callers must not mutate
+        ``symbol``, ``side``, ``qty``, ``price`` or ``market_price`` after
+        submitting.  Pass ``copy=True`` if the caller cannot honour that
+        contract.
         """
-        with self._lock:
-            self._queue.append(order.copy())
-        logger.debug("Broker received order %s", order["order_id"][:8])
+        oid = order["order_id"]
+        coro = self._simulate_order(order.copy() if copy else order)
+        try:
+            asyncio.run_coroutine_threadsafe(coro, self._open_loop())
+        except RuntimeError as exc:
+            # Lost a race with disconnect() closing the loop
+            coro.close()
+            with self._orders_lock:
+                self._orders.pop(oid, None)
+            logger.error("Broker could not schedule order %s: %s", oid[:8], exc)
+            return False
+        logger.debug("Broker received order %s", oid[:8])
         return True
 
     # ------------------------------------------------------------------
     # Background processing
     # ------------------------------------------------------------------
 
-    def _process_loop(self) -> None:
-        """Drain the order queue, simulating latency for each order."""
-        while self._running:
-            order = None
-            with self._lock:
-                if self._queue:
-                    order = self._queue.pop(0)
-            if order is None:
-                time.sleep(0.05)
-                continue
-            self._simulate_order(order)
-
-    def _simulate_order(self, order: dict) -> None:
+    def _open_loop(self) -> asyncio.AbstractEventLoop:
+        """Return the broker loop, replacing it if disconnect() closed it."""
+        with self._loop_lock:
+            if self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+            return self._loop
+
+    def _run_loop(self) -> None:
+        """Serve the event loop until stop() is called."""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _is_cancelled(self, order_id: str) -> bool:
+        with self._orders_lock:
+            order = self._orders.get(order_id)
+            return order is not None and order.get("status") == "CANCELLED"
+
+    async def _simulate_order(self, order: dict) -> None:
+        """Simulate one order; runs as its own task on the broker loop."""
+        oid = order["order_id"]
+        if self._is_cancelled(oid):
+            logger.debug("Skipping cancelled order %s", oid[:8])
+            return
+        try:
+            await self._run_lifecycle(order)
+        except Exception:
+            logger.exception("Simulated order %s failed", oid[:8])
+
+    async def _run_lifecycle(self, order: dict) -> None:
         """Simulate the full lifecycle of a single order."""
         oid = order["order_id"]
+        loop = self._loop
+
+        # Draw every latency up front and turn them into absolute deadlines
+        # on the monotonic clock, so callback work between steps doesn't
+        # stretch the simulated exchange timeline.
+        d_ack, d_partial, d_fill = _latencies(3)
+        ack_at = loop.time() + d_ack / 2
 
         # --- ACK ---
-        latency = random.randint(BROKER_MIN_LATENCY_MS, BROKER_MAX_LATENCY_MS) / 2
-        time.sleep(latency / 1000)
+        await _sleep_until(loop, ack_at)
         self._update_order_status(oid, "ACK", 0, 0.0)
         self._fire_callback(oid, "ACK", 0, 0.0)
 
@@ -245,24 +367,19 @@ class SimulatedBroker(BrokerAdapter):
 
         if do_partial:
             partial_qty = random.randint(1, total_qty - 1)
+            partial_at = ack_at + d_partial
             # Send PARTIAL
-            time.sleep(
-                random.randint(BROKER_MIN_LATENCY_MS, BROKER_MAX_LATENCY_MS) / 1000
-            )
+            await _sleep_until(loop, partial_at)
             self._update_order_status(oid, "PARTIAL", partial_qty, fill_price)
             self._fire_callback(oid, "PARTIAL", partial_qty, fill_price)
 
             # Remaining fill
-            time.sleep(
-                random.randint(BROKER_MIN_LATENCY_MS, BROKER_MAX_LATENCY_MS) / 1000
-            )
+            await _sleep_until(loop, partial_at + d_fill)
             self._update_order_status(oid, "FILLED", total_qty, fill_price)
             self._fire_callback(oid, "FILLED", total_qty, fill_price)
         else:
             # Direct fill
-            time.sleep(
-                random.randint(BROKER_MIN_LATENCY_MS, BROKER_MAX_LATENCY_MS) / 1000
-            )
+            await _sleep_until(loop, ack_at + d_fill)
 
             # Small chance (~5 %) of rejection for realism
             if random.random() < 0.05:
@@ -276,7 +393,7 @@ class SimulatedBroker(BrokerAdapter):
         self, order_id: str, status: str, filled_qty: int, avg_price: float
     ) -> None:
         """Update internal order tracking."""
-        with self._lock:
+        with self._orders_lock:
             if order_id in self._orders:
                 self._orders[order_id]["status"] = status
                 self._orders[order_id]["filled_qty"] = filled_qty
@@ -286,17 +403,12 @@ class SimulatedBroker(BrokerAdapter):
         self, order_id: str, status: str, filled_qty: int, avg_price: float
     ) -> None:
         """Send the update via in-process callback and/or HTTP webhook."""
-        payload: dict[str, Any] = {
-            "order_id": order_id,
-            "status": status,
-            "filled_qty": filled_qty,
-            "avg_price": avg_price,
-        }
+        msg = UpdateMsg(order_id, status, filled_qty, avg_price)
 
         # In-process callback (faster, avoids HTTP overhead)
         if self._on_update:
             try:
-                self._on_update(payload)
+                self._on_update(msg)
                 logger.debug(
                     "Broker callback: %s → %s  filled=%d",
                     order_id[:8],
@@ -307,13 +419,22 @@ class SimulatedBroker(BrokerAdapter):
             except Exception as exc:
                 logger.error("In-process broker callback error: %s", exc)
 
-        # HTTP webhook fallback (only when no in-process callback)
-        try:
-            requests.post(self._webhook_url, json=payload, timeout=2)
-        except Exception:
-            # Webhook delivery is best-effort in a demo
-            pass
+        # HTTP webhook fallback (only when no in-process callback).  The
+        # blocking post runs on the webhook worker so the loop keeps going.
+        self._webhook_pool.submit(self._post_webhook, _json_dumps(msg._asdict()))
 
         logger.debug(
             "Broker callback: %s → %s  filled=%d", order_id[:8], status, filled_qty
         )
+
+    def _post_webhook(self, body: bytes) -> None:
+        try:
+            self._session.post(
+                self._webhook_url,
+                data=body,
+                headers=_JSON_HEADERS,
+                timeout=2,
+            )
+        except Exception:
+            # Webhook delivery is best-effort in a demo
+            pass
@@ -27,14 +27,19 @@ from typing import Optional
 from app.db import storage
 
 
+try:
+    from app.utils.clock import EngineClock
+
+    _CLOCK: Optional[EngineClock] = EngineClock(mode="demo")
+except Exception:
+    _CLOCK = None
+
+
 def _utc_now_iso() -> str:
     """Return current UTC time as ISO 8601 string via EngineClock."""
-    try:
-        from app.utils.clock import EngineClock
-
-        return EngineClock(mode="demo").now_iso()
-    except Exception:
-        return datetime.now(timezone.utc).isoformat()
+    if _CLOCK is not None:
+        return _CLOCK.now_iso()
+    return datetime.now(timezone.utc).isoformat()
 
 
 logger = logging.getLogger(__name__)
@@ -57,7 +62,7 @@ class TradeLedger:
     def total_realised_pnl(self) -> float:
         """Sum of all realised PnL from the trades table."""
         trades = storage.get_trades(limit=10_000, account_id=self._account_id)
-        return sum(t.get("pnl", 0.0) for t in trades)
+        return sum(t.pnl or 0.0 for t in trades)
 
     def trade_count(self) -> int:
         """Total number of trades for this account."""
@@ -66,7 +71,8 @@ class TradeLedger:
 
     def get_recent_trades(self, limit: int = 100) -> list[dict]:
         """Return recent trades from DB."""
-        return storage.get_trades(limit=limit, account_id=self._account_id)
+        trades = storage.get_trades(limit=limit, account_id=self._account_id)
+        return [storage.as_dict(t) for t in trades]
 
     def compute_unrealised_pnl(
         self, current_prices: Optional[dict[str, float]] = None
@@ -81,17 +87,17 @@ class TradeLedger:
         unrealised = 0.0
         positions = storage.get_positions(self._account_id)
         for pos in positions:
-            sym = pos["symbol"]
-            if sym not in current_prices or pos["qty"] <= 0:
+            sym = pos.symbol
+            if sym not in current_prices or pos.qty <= 0:
                 continue
             cp = current_prices[sym]
-            if pos["side"] == "BUY":
-                diff = cp - pos["avg_price"]
-            elif pos["side"] == "SELL":
-                diff = pos["avg_price"] - cp
+            if pos.side == "BUY":
+                diff = cp - pos.avg_price
+            elif pos.side == "SELL":
+                diff = pos.avg_price - cp
             else:
                 continue
-            unrealised += diff * pos["qty"]
+            unrealised += diff * pos.qty
         return unrealised
 
     def compute_pnl(
@@ -109,7 +115,7 @@ class TradeLedger:
 
         # Compute used margin from positions
         positions = storage.get_positions(self._account_id)
-        used_margin = sum(p["avg_price"] * p["qty"] for p in positions if p["qty"] > 0)
+        used_margin = sum(p.avg_price * p.qty for p in positions if p.qty > 0)
 
         total = realised + unrealised
         capital = initial_capital + total
@@ -160,13 +166,3 @@ class TradeLedger:
         Returns a dict with the discrepancy (if any).
         """
         return self.rebuild_capital_from_trades(capital_mgr)
-        ledger_realised = self.total_realised_pnl()
-        cm_realised = capital_mgr.realised_pnl
-        drift = abs(ledger_realised - cm_realised)
-
-        return {
-            "ledger_realised": round(ledger_realised, 2),
-            "cm_realised": round(cm_realised, 2),
-            "drift": round(drift, 2),
-            "match": drift < 0.01,
-        }
@@ -6,128 +6,224 @@ sensible defaults.  Every tunable parameter lives here — no magic numbers
 elsewhere in the codebase.
 """
 
+import functools
 import os
+import sys
+from collections import ChainMap
+from dataclasses import dataclass, field, fields
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import Any, Callable, Optional
 
-# Load .env from project root
 _PROJECT_ROOT = Path(__file__).resolve().parent.parent
-load_dotenv(_PROJECT_ROOT / ".env")
-
-# ---------------------------------------------------------------------------
-# Flask
-# ---------------------------------------------------------------------------
-FLASK_HOST: str = os.getenv("FLASK_HOST", "0.0.0.0")
-FLASK_PORT: int = int(os.getenv("FLASK_PORT", "5005"))
-FLASK_DEBUG: bool = os.getenv("FLASK_DEBUG", "false").lower() == "true"
-SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret-key")
-
-# ---------------------------------------------------------------------------
-# Market data
-# ---------------------------------------------------------------------------
-DEFAULT_SYMBOLS: list[str] = os.getenv(
-    "DEFAULT_SYMBOLS", "RELIANCE.NS,TCS.NS,INFY.NS"
-).split(",")
-TICK_INTERVAL_SEC: float = float(os.getenv("TICK_INTERVAL_SEC", "0.5"))
-DATA_DIR: Path = _PROJECT_ROOT / os.getenv("DATA_DIR", "data")
-
-# ---------------------------------------------------------------------------
-# Strategy
-# ---------------------------------------------------------------------------
-DEFAULT_STRATEGY: str = os.getenv("DEFAULT_STRATEGY", "sma_crossover")
-SMA_SHORT: int = int(os.getenv("SMA_SHORT", "20"))
-SMA_LONG: int = int(os.getenv("SMA_LONG", "50"))
-RSI_PERIOD: int = int(os.getenv("RSI_PERIOD", "14"))
-RSI_OVERSOLD: int = int(os.getenv("RSI_OVERSOLD", "30"))
-RSI_OVERBOUGHT: int = int(os.getenv("RSI_OVERBOUGHT", "70"))
-
-# ---------------------------------------------------------------------------
-# Risk management
-# ---------------------------------------------------------------------------
-INITIAL_CAPITAL: float = float(os.getenv("INITIAL_CAPITAL", "1000000"))
-RISK_PER_TRADE_PCT: float = float(os.getenv("RISK_PER_TRADE_PCT", "1.0"))
-DEFAULT_STOP_LOSS_PCT: float = float(os.getenv("DEFAULT_STOP_LOSS_PCT", "2.0"))
-DEFAULT_TAKE_PROFIT_PCT: float = float(os.getenv("DEFAULT_TAKE_PROFIT_PCT", "4.0"))
-MIN_STOP_LOSS_PCT: float = float(os.getenv("MIN_STOP_LOSS_PCT", "0.5"))
-MAX_OPEN_POSITIONS: int = int(os.getenv("MAX_OPEN_POSITIONS", "10"))
-MAX_POSITION_SIZE_PER_TRADE: int = int(os.getenv("MAX_POSITION_SIZE_PER_TRADE", "500"))
-MAX_QTY_PER_ORDER: int = int(os.getenv("MAX_QTY_PER_ORDER", "10000"))
-MAX_TOTAL_EXPOSURE_PERCENT: float = float(
-    os.getenv("MAX_TOTAL_EXPOSURE_PERCENT", "80.0")
-)
-DAILY_LOSS_LIMIT: float = float(os.getenv("DAILY_LOSS_LIMIT", "50000"))
-SIGNAL_COOLDOWN_TICKS: int = int(os.getenv("SIGNAL_COOLDOWN_TICKS", "100"))
-STRATEGY_COOLDOWN_CANDLES: int = int(os.getenv("STRATEGY_COOLDOWN_CANDLES", "5"))
-ORDER_TIMEOUT_SEC: int = int(os.getenv("ORDER_TIMEOUT_SEC", "60"))
-
-# ---------------------------------------------------------------------------
-# ML
-# ---------------------------------------------------------------------------
-ML_ENABLED: bool = os.getenv("ML_ENABLED", "false").lower() == "true"
-ML_PROBABILITY_THRESHOLD: float = float(os.getenv("ML_PROBABILITY_THRESHOLD", "0.65"))
-ML_MODEL_PATH: Path = _PROJECT_ROOT / "app" / "ml" / "models" / "xgb_model.json"
-
-# ---------------------------------------------------------------------------
-# Simulated broker
-# ---------------------------------------------------------------------------
-BROKER_MIN_LATENCY_MS: int = int(os.getenv("BROKER_MIN_LATENCY_MS", "200"))
-BROKER_MAX_LATENCY_MS: int = int(os.getenv("BROKER_MAX_LATENCY_MS", "800"))
-SLIPPAGE_PCT: float = float(os.getenv("SLIPPAGE_PCT", "0.05"))
-
-# ---------------------------------------------------------------------------
-# Logging
-# ---------------------------------------------------------------------------
-LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
-LOG_FILE: str = os.getenv("LOG_FILE", "logs/app.log")
-
-# ---------------------------------------------------------------------------
-# Database
-# ---------------------------------------------------------------------------
-DB_PATH: Path = _PROJECT_ROOT / "data" / "algo_demo.db"
-
-# ---------------------------------------------------------------------------
-# Paths
-# ---------------------------------------------------------------------------
-PROJECT_ROOT: Path = _PROJECT_ROOT
-
-# ---------------------------------------------------------------------------
-# Trading mode  ("demo" | "paper" | "live")
-# ---------------------------------------------------------------------------
-# demo  — synthetic data generator + random indices allowed
-# paper — real market data feeds, simulated execution (no real money)
-# live  — real data + real broker execution (DANGER)
-MODE: str = os.getenv("MODE", "demo")
-
-# ---------------------------------------------------------------------------
-# Engine safety guards
-# ---------------------------------------------------------------------------
-# Kill-switch: if True the engine will refuse to start
-KILL_SWITCH: bool = os.getenv("KILL_SWITCH", "false").lower() == "true"
-# Maximum % of capital lost in a single day before engine auto-stops
-MAX_DAILY_LOSS_PCT: float = float(os.getenv("MAX_DAILY_LOSS_PCT", "5.0"))
-
-# ---------------------------------------------------------------------------
-# Signal cooldown (time-based, complements tick-based cooldown)
-# ---------------------------------------------------------------------------
-SIGNAL_COOLDOWN_SEC: float = float(os.getenv("SIGNAL_COOLDOWN_SEC", "30.0"))
-
-# ---------------------------------------------------------------------------
-# Manual order gating when engine is stopped
-# ---------------------------------------------------------------------------
-ALLOW_MANUAL_WHEN_STOPPED: bool = (
-    os.getenv("ALLOW_MANUAL_WHEN_STOPPED", "true").lower() == "true"
-)
-
-# ---------------------------------------------------------------------------
-# PnL snapshot interval (in tick cycles)
-# ---------------------------------------------------------------------------
-PNL_SNAPSHOT_INTERVAL: int = int(os.getenv("PNL_SNAPSHOT_INTERVAL", "60"))
-
-# ---------------------------------------------------------------------------
-# Risk: position-size explosion guards
-# ---------------------------------------------------------------------------
-MIN_STOP_DISTANCE_PCT: float = float(os.getenv("MIN_STOP_DISTANCE_PCT", "0.5"))
-MAX_POSITION_SIZE_PCT_OF_CAPITAL: float = float(
-    os.getenv("MAX_POSITION_SIZE_PCT_OF_CAPITAL", "10.0")
-)
-ABSOLUTE_MAX_QTY: int = int(os.getenv("ABSOLUTE_MAX_QTY", "5000"))
+
+# Real environment variables take precedence over .env, matching
+# load_dotenv()'s default.  The view is built on the first _g() lookup.
+_raw: Optional[ChainMap] = None
+
+
+def _ensure_env_loaded() -> ChainMap:
+    """Parse ``.env`` from the project root exactly once."""
+    global _raw
+    if _raw is None:
+        from dotenv import dotenv_values
+
+        _raw = ChainMap(os.environ, dotenv_values(_PROJECT_ROOT / ".env"))
+    return _raw
+
+
+def _bool(value: str) -> bool:
+    return str(value).lower() == "true"
+
+
+def _g(key: str, default: Any, cast: Callable[[str], Any] = str) -> Any:
+    """Return setting ``key`` converted with ``cast``, or ``default``."""
+    value = _ensure_env_loaded().get(key)
+    return cast(value) if value is not None else default
+
+
+def _env(key: str, default: Any, cast: Callable[[str], Any] = str) -> Any:
+    """Declare a Settings field read from ``key`` when Settings is built."""
+    return field(default_factory=functools.partial(_g, key, default, cast))
+
+
+def _symbols(value: str) -> tuple[str, ...]:
+    # Stripped once and interned so they share storage with symbol dict keys
+    return tuple(sys.intern(s.strip()) for s in value.split(",") if s.strip())
+
+
+def _project_path(value: str) -> Path:
+    return _PROJECT_ROOT / value
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Immutable snapshot of every configuration value."""
+
+    # -----------------------------------------------------------------------
+    # Flask
+    # -----------------------------------------------------------------------
+    FLASK_HOST: str = _env("FLASK_HOST", "0.0.0.0")
+    FLASK_PORT: int = _env("FLASK_PORT", 5005, int)
+    FLASK_DEBUG: bool = _env("FLASK_DEBUG", False, _bool)
+    SECRET_KEY: str = _env("SECRET_KEY", "dev-secret-key")
+
+    # -----------------------------------------------------------------------
+    # Market data
+    # -----------------------------------------------------------------------
+    DEFAULT_SYMBOLS: tuple[str, ...] = _env(
+        "DEFAULT_SYMBOLS", _symbols("RELIANCE.NS,TCS.NS,INFY.NS"), _symbols
+    )
+    TICK_INTERVAL_SEC: float = _env("TICK_INTERVAL_SEC", 0.5, float)
+    DATA_DIR: Path = _env("DATA_DIR", _PROJECT_ROOT / "data", _project_path)
+
+    # -----------------------------------------------------------------------
+    # Strategy
+    # -----------------------------------------------------------------------
+    DEFAULT_STRATEGY: str = _env("DEFAULT_STRATEGY", "sma_crossover")
+    SMA_SHORT: int = _env("SMA_SHORT", 20, int)
+    SMA_LONG: int = _env("SMA_LONG", 50, int)
+    RSI_PERIOD: int = _env("RSI_PERIOD", 14, int)
+    RSI_OVERSOLD: int = _env("RSI_OVERSOLD", 30, int)
+    RSI_OVERBOUGHT: int = _env("RSI_OVERBOUGHT", 70, int)
+
+    # -----------------------------------------------------------------------
+    # Risk management
+    # -----------------------------------------------------------------------
+    INITIAL_CAPITAL: float = _env("INITIAL_CAPITAL", 1000000.0, float)
+    RISK_PER_TRADE_PCT: float = _env("RISK_PER_TRADE_PCT", 1.0, float)
+    DEFAULT_STOP_LOSS_PCT: float = _env("DEFAULT_STOP_LOSS_PCT", 2.0, float)
+    DEFAULT_TAKE_PROFIT_PCT: float = _env("DEFAULT_TAKE_PROFIT_PCT", 4.0, float)
+    MIN_STOP_LOSS_PCT: float = _env("MIN_STOP_LOSS_PCT", 0.5, float)
+    MAX_OPEN_POSITIONS: int = _env("MAX_OPEN_POSITIONS", 10, int)
+    MAX_POSITION_SIZE_PER_TRADE: int = _env("MAX_POSITION_SIZE_PER_TRADE", 500, int)
+    MAX_QTY_PER_ORDER: int = _env("MAX_QTY_PER_ORDER", 10000, int)
+    MAX_TOTAL_EXPOSURE_PERCENT: float = _env("MAX_TOTAL_EXPOSURE_PERCENT", 80.0, float)
+    DAILY_LOSS_LIMIT: float = _env("DAILY_LOSS_LIMIT", 50000.0, float)
+    SIGNAL_COOLDOWN_TICKS: int = _env("SIGNAL_COOLDOWN_TICKS", 100, int)
+    STRATEGY_COOLDOWN_CANDLES: int = _env("STRATEGY_COOLDOWN_CANDLES", 5, int)
+    ORDER_TIMEOUT_SEC: int = _env("ORDER_TIMEOUT_SEC", 60, int)
+
+    # -----------------------------------------------------------------------
+    # ML
+    # -----------------------------------------------------------------------
+    ML_ENABLED: bool = _env("ML_ENABLED", False, _bool)
+    ML_PROBABILITY_THRESHOLD: float = _env("ML_PROBABILITY_THRESHOLD", 0.65, float)
+    ML_MODEL_PATH: Path = _PROJECT_ROOT / "app" / "ml" / "models" / "xgb_model.json"
+
+    # -----------------------------------------------------------------------
+    # Simulated broker
+    # -----------------------------------------------------------------------
+    BROKER_MIN_LATENCY_MS: int = _env("BROKER_MIN_LATENCY_MS", 200, int)
+    BROKER_MAX_LATENCY_MS: int = _env("BROKER_MAX_LATENCY_MS", 800, int)
+    SLIPPAGE_PCT: float = _env("SLIPPAGE_PCT", 0.05, float)
+
+    # -----------------------------------------------------------------------
+    # Logging
+    # -----------------------------------------------------------------------
+    LOG_LEVEL: str = _env("LOG_LEVEL", "INFO")
+    LOG_FILE: str = _env("LOG_FILE", "logs/app.log")
+
+    # -----------------------------------------------------------------------
+    # Database
+    # -----------------------------------------------------------------------
+    DB_PATH: Path = _PROJECT_ROOT / "data" / "algo_demo.db"
+    # SQLite PRAGMA synchronous level: NORMAL (fast, WAL-safe) or FULL
+    DB_SYNCHRONOUS: str = _env("DB_SYNCHRONOUS", "NORMAL", str.upper)
+    # Bytes of the DB file SQLite reads through mmap; 0 disables (e.g. on NFS)
+    DB_MMAP_SIZE: int = _env("DB_MMAP_SIZE", 1 << 30, int)
+    # Candles kept in SQLite per (symbol, timeframe); older ones move to an
+    # Arrow archive beside the DB (needs pyarrow).  0 keeps them all in SQLite
+    CANDLE_ARCHIVE_KEEP: int = _env("CANDLE_ARCHIVE_KEEP", 0, int)
+
+    # -----------------------------------------------------------------------
+    # Paths
+    # -----------------------------------------------------------------------
+    PROJECT_ROOT: Path = _PROJECT_ROOT
+    # -----------------------------------------------------------------------
+    # Trading mode  ("demo" | "paper" | "live")
+    # -----------------------------------------------------------------------
+    # demo  — synthetic data generator + random indices allowed
+    # paper — real market data feeds, simulated execution (no real money)
+    # live  — real data + real broker execution (DANGER)
+    MODE: str = _env("MODE", "demo")
+
+    # -----------------------------------------------------------------------
+    # Engine safety guards
+    # -----------------------------------------------------------------------
+    # Kill-switch: if True the engine will refuse to start
+    KILL_SWITCH: bool = _env("KILL_SWITCH", False, _bool)
+    # Maximum % of capital lost in a single day before engine auto-stops
+    MAX_DAILY_LOSS_PCT: float = _env("MAX_DAILY_LOSS_PCT", 5.0, float)
+
+    # -----------------------------------------------------------------------
+    # Signal cooldown (time-based, complements tick-based cooldown)
+    # -----------------------------------------------------------------------
+    SIGNAL_COOLDOWN_SEC: float = _env("SIGNAL_COOLDOWN_SEC", 30.0, float)
+
+    # -----------------------------------------------------------------------
+    # Manual order gating when engine is stopped
+    # -----------------------------------------------------------------------
+    ALLOW_MANUAL_WHEN_STOPPED: bool = _env("ALLOW_MANUAL_WHEN_STOPPED", True, _bool)
+
+    # -----------------------------------------------------------------------
+    # PnL snapshot interval (in tick cycles)
+    # -----------------------------------------------------------------------
+    PNL_SNAPSHOT_INTERVAL: int = _env("PNL_SNAPSHOT_INTERVAL", 60, int)
+
+    # -----------------------------------------------------------------------
+    # Risk: position-size explosion guards
+    # -----------------------------------------------------------------------
+    MIN_STOP_DISTANCE_PCT: float = _env("MIN_STOP_DISTANCE_PCT", 0.5, float)
+    MAX_POSITION_SIZE_PCT_OF_CAPITAL: float = _env(
+        "MAX_POSITION_SIZE_PCT_OF_CAPITAL", 10.0, float
+    )
+    ABSOLUTE_MAX_QTY: int = _env("ABSOLUTE_MAX_QTY", 5000, int)
+
+
+@functools.cache
+def get_settings() -> Settings:
+    """Return the process-wide Settings, built on first call."""
+    return Settings()
+
+
+def _ensure_dirs(settings: Settings) -> None:
+    """Create the data, database and log directories once, up front."""
+    log_dir = Path(settings.LOG_FILE).parent
+    for d in {settings.DATA_DIR, settings.DB_PATH.parent, log_dir}:
+        d.mkdir(parents=True, exist_ok=True)
+
+
+def reset_settings() -> Settings:
+    """Re-read the environment and ``.env`` and rebuild Settings (tests).
+
+    ``get_settings()`` and ``config.NAME`` lookups see the new values.
+    Copies taken with ``from app.config import NAME``, and anything built
+    from them at import (SQLite pragmas, default arguments), keep the
+    values they were created with.
+    """
+    global _raw
+    _raw = None
+    get_settings.cache_clear()
+    settings = get_settings()
+    _ensure_dirs(settings)
+    return settings
+
+
+_FIELD_NAMES = frozenset(f.name for f in fields(Settings))
+
+
+def __getattr__(name: str) -> Any:
+    """Resolve ``config.NAME`` against the current Settings (PEP 562)."""
+    if name in _FIELD_NAMES:
+        return getattr(get_settings(), name)
+    if name == "DB_PATH_STR":
+        # Pre-stringified for sqlite3.connect()
+        return str(get_settings().DB_PATH)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_FIELD_NAMES, "DB_PATH_STR"})
+
+
+_ensure_dirs(get_settings())
@@ -11,19 +11,27 @@ Finance or file I/O directly.
 import logging
 import threading
 import time
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Generator, Optional, Sequence
 
 from app.data_feed.base import DataFeed, TickCallback
 from app.utils.data import (
+    batched_tick_generator,
+    load_tick_buffer,
     tick_generator,
     resolve_symbol,
     download_ohlcv,
-    load_cached_ohlcv,
+    cached_ohlcv_path,
 )
 
 logger = logging.getLogger(__name__)
 
 
+def _has_cached_data(symbol: str) -> bool:
+    path = cached_ohlcv_path(symbol)
+    return path.exists() and path.stat().st_size > 0
+
+
 class DemoDataFeed(DataFeed):
     """
     Replay historical OHLCV data as a simulated live tick stream.
@@ -34,25 +42,30 @@ class DemoDataFeed(DataFeed):
 
     def __init__(
         self,
-        symbols: list[str],
+        symbols: Sequence[str],
         tick_interval: float = 0.5,
         loop: bool = True,
     ):
         """
         Parameters
         ----------
-        symbols : list[str]
-            Initial symbols to subscribe to (e.g. ``["RELIANCE.NS", "TCS.NS"]``).
+        symbols : Sequence[str]
+            Initial symbols to subscribe to (e.g. ``("RELIANCE.NS", "TCS.NS")``).
         tick_interval : float
             Seconds between ticks *within* a cycle (inter-symbol delay).
         loop : bool
             Whether to wrap around when CSV data is exhausted.
         """
-        self._symbols: list[str] = list(symbols)
+        # Insertion-ordered dict used as a set: O(1) subscribe/unsubscribe.
+        # Names are resolved (and interned) once here so later lookups
+        # never re-resolve.
+        self._symbols: dict[str, None] = {resolve_symbol(s): None for s in symbols}
         self._tick_interval = tick_interval
         self._loop = loop
 
         self._callbacks: list[TickCallback] = []
+        # Immutable copy read by dispatch(); rebuilt only when on_tick() adds
+        self._callbacks_snapshot: tuple[TickCallback, ...] = ()
         self._connected = False
         self._stop_event = threading.Event()
         self._thread: Optional[threading.Thread] = None
@@ -66,16 +79,36 @@ class DemoDataFeed(DataFeed):
             logger.warning("DemoDataFeed already connected")
             return
 
-        # Ensure data exists for all symbols
-        for sym in self._symbols:
-            df = load_cached_ohlcv(sym)
-            if df.empty:
-                logger.info("Downloading data for %s ...", sym)
-                download_ohlcv(sym)
+        # Ensure data exists for all symbols — a stat per symbol, no parsing
+        missing = [sym for sym in self._symbols if not _has_cached_data(sym)]
+        if missing:
+            self._download_missing(missing)
 
         self._stop_event.clear()
         self._connected = True
-        logger.info("DemoDataFeed connected — symbols=%s", self._symbols)
+        logger.info("DemoDataFeed connected — symbols=%s", list(self._symbols))
+
+    def _download_missing(self, missing: list[str]) -> None:
+        """Fetch OHLCV for ``missing`` concurrently; failures are logged, not raised."""
+        logger.info("Downloading data for %s ...", missing)
+        started = time.perf_counter()
+        failed: list[str] = []
+        # download_ohlcv is I/O-bound, so cold symbols are fetched in parallel
+        with ThreadPoolExecutor(max_workers=min(16, len(missing) or 1)) as pool:
+            futures = {pool.submit(download_ohlcv, sym): sym for sym in missing}
+            for fut in as_completed(futures):
+                sym = futures[fut]
+                try:
+                    fut.result()
+                except Exception as exc:
+                    failed.append(sym)
+                    logger.error("Download failed for %s: %s", sym, exc)
+        logger.info(
+            "Downloaded %d/%d symbols in %.2fs",
+            len(missing) - len(failed),
+            len(missing),
+            time.perf_counter() - started,
+        )
 
     def disconnect(self) -> None:
         self._stop_event.set()
@@ -87,17 +120,18 @@ class DemoDataFeed(DataFeed):
     def subscribe(self, symbol: str) -> None:
         resolved = resolve_symbol(symbol)
         if resolved not in self._symbols:
-            self._symbols.append(resolved)
+            self._symbols[resolved] = None
             logger.info("Subscribed to %s", resolved)
 
     def unsubscribe(self, symbol: str) -> None:
         resolved = resolve_symbol(symbol)
         if resolved in self._symbols:
-            self._symbols.remove(resolved)
+            del self._symbols[resolved]
             logger.info("Unsubscribed from %s", resolved)
 
     def on_tick(self, callback: TickCallback) -> None:
         self._callbacks.append(callback)
+        self._callbacks_snapshot = tuple(self._callbacks)
 
     def get_symbols(self) -> list[str]:
         return list(self._symbols)
@@ -110,19 +144,42 @@ class DemoDataFeed(DataFeed):
     # Tick generation
     # ------------------------------------------------------------------
 
-    def create_generators(self) -> dict:
+    def create_generators(self, stamp: bool = True) -> dict:
         """
         Create tick generators for all subscribed symbols.
 
         Returns a dict mapping resolved_symbol -> generator.
         Called by the consumer (e.g. main.py tick loop) to get generators
-        that yield tick dicts.
+        that yield tick dicts.  ``stamp=False`` leaves ``"timestamp"`` to
+        the consumer (see ``tick_generator``).
+        """
+        return {
+            sym: tick_generator(sym, interval_sec=0, stamp=stamp)
+            for sym in self._symbols
+        }
+
+    def create_batched_generator(
+        self, stamp: bool = True
+    ) -> Generator[list[dict], None, None]:
         """
-        generators = {}
-        for sym in self._symbols:
-            resolved = resolve_symbol(sym)
-            generators[resolved] = tick_generator(sym, interval_sec=0)
-        return generators
+        Create ONE tick generator for all subscribed symbols.
+
+        Each ``next()`` returns the ticks of one bar, one per symbol with
+        data (see ``batched_tick_generator``).
+        """
+        buffer = load_tick_buffer(list(self._symbols))
+        return batched_tick_generator(
+            buffer, interval_sec=0, loop=self._loop, stamp=stamp
+        )
+
+    def dispatch(self, tick: dict) -> None:
+        """Deliver ``tick`` to every callback registered via ``on_tick``."""
+        cbs = self._callbacks_snapshot
+        if len(cbs) == 1:
+            cbs[0](tick)
+            return
+        for cb in cbs:
+            cb(tick)
 
     @property
     def should_stop(self) -> bool:
@@ -14,6 +14,8 @@ Usage::
     provider.subscribe_live(["RELIANCE.NS"], on_tick_callback)
 """
 
+import functools
+import importlib.util
 import logging
 from abc import ABC, abstractmethod
 from typing import Callable, Optional
@@ -26,6 +28,9 @@ logger = logging.getLogger(__name__)
 # Type alias for tick callbacks
 TickCallback = Callable[[dict], None]
 
+# Probe once without importing — yfinance pulls in a heavy dependency tree
+_HAS_YFINANCE: bool = importlib.util.find_spec("yfinance") is not None
+
 
 class MarketDataProvider(ABC):
     """
@@ -115,13 +120,8 @@ class YahooProvider(MarketDataProvider):
     """
 
     def __init__(self):
-        # Lazy import so the module loads even if yfinance isn't installed
-        self._yf_available = False
-        try:
-            import yfinance  # noqa: F401
-
-            self._yf_available = True
-        except ImportError:
+        self._yf_available = _HAS_YFINANCE
+        if not self._yf_available:
             logger.warning(
                 "yfinance not installed — YahooProvider will use synthetic data"
             )
@@ -252,8 +252,19 @@ class ZerodhaProvider(MarketDataProvider):
 # =========================================================================
 
 
+_PROVIDER_FACTORIES: dict[str, Callable[[], MarketDataProvider]] = {
+    "demo": YahooProvider,
+    "paper": YahooProvider,
+    "live": ZerodhaProvider,
+}
+
+
+@functools.lru_cache(maxsize=4)
 def create_provider(mode: str = "demo") -> MarketDataProvider:
-    """Create and return the appropriate data provider for the given mode.
+    """Return the data provider for the given mode.
+
+    Providers are cached per mode, so repeated calls return the same
+    instance.
 
     Parameters
     ----------
@@ -262,12 +273,10 @@ def create_provider(mode: str = "demo") -> MarketDataProvider:
         "paper" → YahooProvider (real Yahoo data, simulated execution)
         "live"  → ZerodhaProvider (real data + real broker)
     """
-    if mode in ("demo", "paper"):
-        logger.info("Creating YahooProvider for mode=%s", mode)
-        return YahooProvider()
-    elif mode == "live":
-        logger.info("Creating ZerodhaProvider for mode=%s", mode)
-        return ZerodhaProvider()
-    else:
+    factory = _PROVIDER_FACTORIES.get(mode)
+    if factory is None:
         logger.warning("Unknown mode '%s' — defaulting to YahooProvider", mode)
-        return YahooProvider()
+        factory = YahooProvider
+    provider = factory()
+    logger.info("Created %s provider for mode=%s", provider.name, mode)
+    return provider
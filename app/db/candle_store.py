@@ -0,0 +1,129 @@
+"""
+app/db/candle_store.py
+======================
+Columnar archive for old candles, stored beside the SQLite database.
+
+``storage.archive_candles()`` moves all but the newest candles of each
+(symbol, timeframe) out of the ``candles`` table and into this store, one
+Arrow IPC file ("segment") per move.  Segments are immutable and read via
+``mmap``, so a long history read slices a few columns instead of walking
+the candles B-tree, and SQLite only keeps the recent, still-changing rows.
+
+Requires ``pyarrow``.  Without it ``AVAILABLE`` is False and storage never
+creates a store, so every candle stays in SQLite.
+"""
+
+import logging
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    AVAILABLE = True
+except ImportError:
+    AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Numeric columns in the order storage's numpy candle readers use
+NP_FIELDS = ("timestamp", "open", "high", "low", "close", "volume")
+
+if AVAILABLE:
+    _SCHEMA = pa.schema(
+        [
+            ("symbol", pa.string()),
+            ("timeframe", pa.string()),
+            ("timestamp", pa.int64()),
+            ("open", pa.float64()),
+            ("high", pa.float64()),
+            ("low", pa.float64()),
+            ("close", pa.float64()),
+            ("volume", pa.float64()),
+        ]
+    )
+
+
+class CandleStore:
+    """Append-only set of Arrow segments under one directory.
+
+    Rows are ``(symbol, timeframe, timestamp, open, high, low, close,
+    volume)`` tuples.  Each ``append()`` must only carry candles older than
+    every candle appended after it for the same series, which is how
+    ``archive_candles()`` moves them.
+    """
+
+    def __init__(self, directory: Path):
+        self._dir = Path(directory)
+        # Serialises writers with the segment listing in read_tail()
+        self._lock = threading.Lock()
+
+    def _segments(self) -> list[Path]:
+        """Segment paths, newest first (names sort by creation time)."""
+        return sorted(self._dir.glob("seg-*.arrow"), reverse=True)
+
+    def append(self, rows: list[tuple]) -> None:
+        """Write ``rows`` as one new segment; returns once it is on disk."""
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(col, type=f.type) for col, f in zip(columns, _SCHEMA)],
+            schema=_SCHEMA,
+        )
+        with self._lock:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            path = self._dir / f"seg-{time.time_ns()}.arrow"
+            tmp = path.with_suffix(".tmp")
+            with pa.OSFile(str(tmp), "wb") as sink:
+                with pa.ipc.new_file(sink, _SCHEMA) as writer:
+                    writer.write_batch(batch)
+            # Readers only glob *.arrow, so they never see a partial file
+            tmp.replace(path)
+        logger.debug("Archived %d candles to %s", len(rows), path.name)
+
+    def read_tail(
+        self, symbol: str, timeframe: str, limit: int, before: int
+    ) -> np.ndarray:
+        """Return up to *limit* archived candles with timestamp < *before*.
+
+        The result is a float64 ``(n, 6)`` array in ``NP_FIELDS`` order,
+        ascending by timestamp.
+        """
+        with self._lock:
+            segments = self._segments()
+        parts = []
+        have = 0
+        for path in segments:
+            if have >= limit:
+                break
+            table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+            mask = pc.and_(
+                pc.and_(
+                    pc.equal(table["symbol"], symbol),
+                    pc.equal(table["timeframe"], timeframe),
+                ),
+                pc.less(table["timestamp"], before),
+            )
+            table = table.filter(mask)
+            if table.num_rows:
+                parts.append(
+                    np.column_stack(
+                        [table[name].to_numpy() for name in NP_FIELDS]
+                    ).astype(np.float64)
+                )
+                have += table.num_rows
+        if not parts:
+            return np.empty((0, 6), dtype=np.float64)
+        # Segments were visited newest first; each is ascending inside
+        return np.concatenate(parts[::-1])[-limit:]
+
+    def clear(self) -> None:
+        """Delete every segment (``reset_db``)."""
+        with self._lock:
+            for path in self._segments():
+                path.unlink(missing_ok=True)
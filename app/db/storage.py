@@ -1,4 +1,4 @@
-    """
+"""
 app/db/storage.py
 =================
 SQLite-backed persistence â€” **single source of truth** for:
@@ -7,40 +7,220 @@ SQLite-backed persistence â€” **single source of truth** for:
     - positions (per-symbol qty, avg_price, side)
     - orders, trades, PnL history, strategy logs, candles
 
-Thread-safe: uses ``check_same_thread=False`` and a module-level lock
-for all writes.  All timestamps use ``EngineClock.now_iso()`` (UTC ISO 8601).
+Thread-safe: uses ``check_same_thread=False``; writes run inside
+``_txn(shard)`` (per-shard lock + ``BEGIN IMMEDIATE``), reads use a pool of
+read-only connections.
+All timestamps are UTC ISO 8601; order, trade and account rows use
+``EngineClock.now_iso()``.
 """
 
+import atexit
 import sqlite3
+import sys
+import queue
 import threading
+import time
 import json
 import logging
+from collections import deque
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+
+
+try:
+    from app.utils.clock import EngineClock
+except ImportError:
+    EngineClock = None
+
+# Created on first use and reused for every DB timestamp
+_ENGINE_CLOCK: Optional["EngineClock"] = None
+_UTC = timezone.utc
 
 
 def _utc_now() -> str:
     """Return current UTC time as ISO 8601 string.
 
-    Single chokepoint for all DB timestamps.  Uses EngineClock when
-    available (runtime), falls back to datetime.now(timezone.utc)
-    during early init before the clock is instantiated.
+    Single chokepoint for all DB timestamps.  Uses a cached EngineClock
+    when available (runtime), falls back to datetime.now(timezone.utc)
+    if the clock cannot be created.
     """
-    try:
-        from app.utils.clock import EngineClock
+    global _ENGINE_CLOCK
+    if _ENGINE_CLOCK is None:
+        try:
+            _ENGINE_CLOCK = EngineClock(mode="demo")
+        except Exception:
+            return datetime.now(_UTC).isoformat()
+    return _ENGINE_CLOCK.now_iso()
 
-        return EngineClock(mode="demo").now_iso()
-    except Exception:
-        return datetime.now(timezone.utc).isoformat()
+
+# (epoch second, its formatted "YYYY-MM-DDTHH:MM:SS"), swapped as one tuple
+# so a reader never pairs one second's prefix with another second
+_fast_second: tuple[int, str] = (-1, "")
 
 
-from app.config import DB_PATH
+def _utc_now_fast() -> str:
+    """Return the same ISO 8601 format as ``_utc_now`` without a datetime.
+
+    For high-volume rows (PnL snapshots, strategy logs) whose timestamps are
+    informational; orders, trades and accounts keep going through
+    ``_utc_now`` so a simulated EngineClock stays authoritative for them.
+    The date/time prefix is formatted once per second; other calls only
+    format the microseconds.
+    """
+    global _fast_second
+    secs, rem = divmod(time.time_ns(), 1_000_000_000)
+    cached_secs, prefix = _fast_second
+    if cached_secs != secs:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(secs))
+        _fast_second = (secs, prefix)
+    return f"{prefix}.{rem // 1000:06d}+00:00"
+
+
+from app.config import (
+    CANDLE_ARCHIVE_KEEP,
+    DB_MMAP_SIZE,
+    DB_PATH,
+    DB_PATH_STR,
+    DB_SYNCHRONOUS,
+)
+from app.db import candle_store
 
 logger = logging.getLogger(__name__)
 
-_lock = threading.Lock()
-_conn: Optional[sqlite3.Connection] = None
+# The public API; everything else is an implementation detail
+__all__ = [
+    # Write-behind queue and WAL maintenance
+    "flush_writes",
+    "checkpoint_now",
+    # Row types
+    "Candle",
+    "Trade",
+    "Position",
+    "as_dict",
+    # Users
+    "create_user",
+    "get_user_by_username",
+    "get_user_by_id",
+    # Accounts
+    "ensure_default_account",
+    "get_account",
+    "update_account",
+    "update_daily_loss_halted",
+    "update_engine_state",
+    "get_engine_state",
+    "reset_account",
+    # Positions
+    "upsert_position",
+    "get_positions",
+    "get_position",
+    "delete_all_positions",
+    # Orders and trades
+    "insert_order",
+    "insert_orders_many",
+    "update_order",
+    "get_order",
+    "get_all_orders",
+    "get_open_orders",
+    "insert_trade",
+    "insert_trades_many",
+    "insert_order_and_trade",
+    "record_fill",
+    "get_trades",
+    # PnL history and strategy logs
+    "insert_pnl_snapshot",
+    "rollup_pnl",
+    "get_pnl_history",
+    "insert_strategy_log",
+    # Candles
+    "upsert_candles_bulk",
+    "upsert_candle_rows",
+    "upsert_candle",
+    "upsert_candle_sync",
+    "insert_or_update_candle",
+    "get_recent_candles",
+    "get_recent_candles_np",
+    "get_candles",
+    "archive_candles",
+    "get_candle_count",
+    # Reset
+    "reset_db",
+]
+
+
+def _json_default(obj: Any) -> Any:
+    """Encode numpy scalars/arrays as their Python values, anything else as str."""
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    return str(obj)
+
+
+# orjson is optional — fall back to the stdlib encoder if it isn't installed
+try:
+    import orjson
+
+    _ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def _dumps(obj: Any) -> str:
+        try:
+            return orjson.dumps(obj, option=_ORJSON_OPTS).decode()
+        except TypeError:
+            # Types orjson rejects (e.g. Decimal) still encode via json
+            return json.dumps(obj, default=_json_default)
+
+except ImportError:
+
+    def _dumps(obj: Any) -> str:
+        return json.dumps(obj, default=_json_default)
+
+
+# Tables are split into shards.  Each shard has its own connection, write
+# lock and write-behind queue, so candle and log writes never wait behind an
+# order/account transaction in Python; SQLite still serialises the commits
+# themselves and busy_timeout absorbs that.  Accounts, positions, orders
+# and trades share a shard so they can change in one transaction.
+_TRADING = "trading"  # users, accounts, positions, orders, trades
+_MARKET = "market"  # candles, candle_counts
+_LOGS = "logs"  # pnl_history, pnl_1m, strategy_logs
+
+
+class _Shard:
+    __slots__ = ("name", "lock", "conn", "pending")
+
+    def __init__(self, name: str):
+        self.name = name
+        # Serialises write transactions; re-entrant so _txn() blocks can nest
+        self.lock = threading.RLock()
+        self.conn: Optional[sqlite3.Connection] = None
+        # Write-behind queue of (sql, params); see _enqueue()
+        self.pending: deque[tuple[str, tuple]] = deque()
+
+
+_shards = {name: _Shard(name) for name in (_TRADING, _MARKET, _LOGS)}
+
+_pending_event = threading.Event()
+_writer_lock = threading.Lock()
+_writer_thread: Optional[threading.Thread] = None
+_WRITE_COALESCE_SEC = 0.005
+# Open candle buckets reach the market shard at least this often
+_CANDLE_FLUSH_SEC = 1.0
+# How often the writer moves old candles to the archive, when enabled
+_CANDLE_ARCHIVE_SEC = 600.0
+# How often the writer folds new PnL snapshots into pnl_1m
+_PNL_ROLLUP_SEC = 60.0
+
+_checkpoint_lock = threading.Lock()
+_checkpoint_thread: Optional[threading.Thread] = None
+_CHECKPOINT_INTERVAL_SEC = 2.0
+
+# Read-only connections shared by every SELECT helper; see _reader()
+_READER_POOL_SIZE = 4
+_reader_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(_READER_POOL_SIZE)
+_reader_lock = threading.Lock()
+_readers_opened = 0
 
 
 # ---------------------------------------------------------------------------
@@ -48,16 +228,446 @@ _conn: Optional[sqlite3.Connection] = None
 # ---------------------------------------------------------------------------
 
 
-def _get_conn() -> sqlite3.Connection:
-    """Return (and cache) a module-level SQLite connection."""
-    global _conn
-    if _conn is None:
-        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-        _conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
-        _conn.row_factory = sqlite3.Row
-        _conn.execute("PRAGMA journal_mode=WAL;")
-        _init_tables(_conn)
-    return _conn
+# Applied once to each new connection, right after it is opened.
+# synchronous=NORMAL is durable across application crashes in WAL mode;
+# set DB_SYNCHRONOUS=FULL to also survive power loss.  Automatic WAL
+# checkpoints are off: they would run inside whichever commit crossed the
+# threshold, so the background checkpointer does them instead.
+# The getters are memory-bound scans, so pages are read through mmap rather
+# than read() syscalls.  page_size only takes effect when the file is
+# created; 8 KiB leaves fit twice as many candle rows per page fetch.
+_SYNCHRONOUS = (
+    DB_SYNCHRONOUS if DB_SYNCHRONOUS in ("OFF", "NORMAL", "FULL", "EXTRA") else "NORMAL"
+)
+_PRAGMAS = f"""
+    PRAGMA page_size=8192;
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous={_SYNCHRONOUS};
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size={max(0, DB_MMAP_SIZE)};
+    PRAGMA cache_size=-65536;
+    PRAGMA busy_timeout=5000;
+    PRAGMA wal_autocheckpoint=0;
+"""
+
+
+def _connect(readonly: bool = False) -> sqlite3.Connection:
+    # Autocommit: no implicit BEGIN before DML; writes use _txn().
+    # The statement cache holds every SQL constant below, so hot
+    # helpers never re-prepare their statement.
+    if readonly:
+        target, uri = Path(DB_PATH_STR).resolve().as_uri() + "?mode=ro", True
+    else:
+        target, uri = DB_PATH_STR, False
+    conn = sqlite3.connect(
+        target,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=256,
+        uri=uri,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_PRAGMAS)
+    if readonly:
+        # Readers stay in NORMAL locking mode: EXCLUSIVE under WAL drops the
+        # shared-memory index, so the open fails ("disk I/O error") while
+        # the shard connections hold it, or would lock them out otherwise.
+        conn.execute("PRAGMA query_only=1")
+        conn.row_factory = None
+    # executescript discards PRAGMA results, and SQLite silently keeps the
+    # old journal mode where WAL is unsupported (e.g. some network FSes)
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    if mode.lower() != "wal":
+        logger.warning("SQLite journal_mode is %s, not WAL, for %s", mode, DB_PATH_STR)
+    return conn
+
+
+def _get_conn(shard: str = _TRADING) -> sqlite3.Connection:
+    """Return (and cache) the SQLite connection for ``shard``.
+
+    Each shard opens exactly one connection per process and every thread
+    shares it, so connect and PRAGMA setup are paid once, never per query.
+    It is deliberately not thread-local: under eventlet each greenlet would
+    get its own connection, and ``_txn`` relies on one connection per shard
+    so a shard's lock covers every write on it.
+    """
+    sh = _shards[shard]
+    if sh.conn is not None:
+        return sh.conn
+    if shard != _TRADING:
+        _get_conn(_TRADING)  # the trading connection creates the schema
+    with sh.lock:
+        if sh.conn is None:
+            conn = _connect()
+            if shard == _TRADING:
+                _init_tables(conn)
+                _start_checkpointer()
+            sh.conn = conn
+    return sh.conn
+
+
+@contextmanager
+def _txn(shard: str = _TRADING) -> Iterator[sqlite3.Connection]:
+    """Run the enclosed writes as one ``BEGIN IMMEDIATE`` transaction.
+
+    Reads never touch the shard connections; they use ``_reader()``.
+    A nested ``_txn()`` on the same thread and shard joins the outer
+    transaction.  Queued writes were issued first, so they commit first,
+    in a transaction of their own: a rollback here never takes them along.
+    """
+    sh = _shards[shard]
+    with sh.lock:
+        conn = _get_conn(shard)
+        if conn.in_transaction:
+            yield conn
+            return
+        if sh.pending:
+            _commit_queued(shard)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+def _write(sql: str, params: Iterable, shard: str = _TRADING) -> None:
+    """Run one write statement as its own transaction.
+
+    The shard lock stays: every thread shares the shard connection, and a
+    statement issued while another thread's ``_txn()`` is open would join
+    (and could be rolled back with) that transaction.  What this skips is
+    the explicit BEGIN IMMEDIATE/COMMIT pair; SQLite wraps a lone write
+    statement in a transaction that takes the write lock up front, through
+    busy_timeout, just as BEGIN IMMEDIATE does.
+    """
+    sh = _shards[shard]
+    with sh.lock:
+        conn = _get_conn(shard)
+        if sh.pending and not conn.in_transaction:
+            # Queued writes were issued first, so they must commit first
+            _commit_queued(shard)
+        conn.execute(sql, params)
+
+
+@contextmanager
+def _raw_cursor(shard: str = _TRADING) -> Iterator[sqlite3.Cursor]:
+    """Yield a cursor that returns plain tuples instead of ``sqlite3.Row``.
+
+    For reads that must see the open ``_txn()`` on the same shard, where
+    building Row objects is pure overhead.
+    """
+    cur = _get_conn(shard).cursor()
+    cur.row_factory = None
+    try:
+        yield cur
+    finally:
+        cur.close()
+
+
+def _open_reader() -> sqlite3.Connection:
+    """Open another pooled reader, or wait for one if the pool is full."""
+    global _readers_opened
+    with _reader_lock:
+        if _readers_opened >= _READER_POOL_SIZE:
+            full = True
+        else:
+            _readers_opened += 1
+            full = False
+    if full:
+        return _reader_pool.get()
+    try:
+        _get_conn()  # schema and WAL files exist before a read-only open
+        return _connect(readonly=True)
+    except BaseException:
+        with _reader_lock:
+            _readers_opened -= 1
+        raise
+
+
+@contextmanager
+def _reader() -> Iterator[sqlite3.Cursor]:
+    """Yield a cursor on a pooled read-only connection.
+
+    WAL lets readers run alongside a commit, so SELECT helpers borrow one of
+    ``_READER_POOL_SIZE`` ``mode=ro`` connections instead of queueing on a
+    shard connection behind a write.  They see committed data only, which
+    is why getters of write-behind tables call ``flush_writes()`` first.
+    Rows are plain tuples; getters zip them with a field tuple when they
+    return dicts, which is cheaper than ``dict(sqlite3.Row)``.
+    """
+    try:
+        conn = _reader_pool.get_nowait()
+    except queue.Empty:
+        conn = _open_reader()
+    cur = conn.cursor()
+    try:
+        yield cur
+    finally:
+        cur.close()
+        _reader_pool.put(conn)
+
+
+# ---------------------------------------------------------------------------
+# Write-behind queue
+# ---------------------------------------------------------------------------
+#
+# Append-only inserts (orders, trades, PnL snapshots, strategy logs, candles)
+# return as soon as they are queued on their shard.  A background writer
+# commits everything that arrived within a short window as one transaction
+# per shard, and every _txn() first commits its shard's queue in a
+# transaction of its own, so writes always land in the order they were
+# issued and a caller's rollback never discards queued writes.  Reads
+# of those tables call flush_writes() for their shard first.
+#
+# Candles go one step further: upserts merge into an in-memory open bucket
+# per (symbol, timeframe), and only a closed bucket is queued.  The writer
+# also queues the open buckets every _CANDLE_FLUSH_SEC, and flush_writes()
+# queues them before committing the market shard.
+
+
+def _drain_pending(
+    conn: sqlite3.Connection, batch: list[tuple[str, tuple]]
+) -> None:
+    """Execute queued writes on ``conn``; caller holds the transaction.
+
+    Consecutive statements with the same SQL go in one executemany.  A run
+    that fails is rolled back to a savepoint and replayed row by row, so a
+    bad row (say a duplicate key) loses only itself and is logged.
+    """
+    i, n = 0, len(batch)
+    while i < n:
+        sql = batch[i][0]
+        j = i + 1
+        while j < n and batch[j][0] is sql:
+            j += 1
+        run = [params for _, params in batch[i:j]]
+        i = j
+        if len(run) > 1:
+            conn.execute("SAVEPOINT queued_run")
+            try:
+                conn.executemany(sql, run)
+            except sqlite3.Error:
+                conn.execute("ROLLBACK TO queued_run")
+            else:
+                conn.execute("RELEASE queued_run")
+                continue
+            conn.execute("RELEASE queued_run")
+        # A single statement is atomic on its own; no savepoint needed
+        for params in run:
+            try:
+                conn.execute(sql, params)
+            except sqlite3.Error:
+                logger.exception(
+                    "Queued write failed: %s %r", sql.split("(", 1)[0], params
+                )
+
+
+def _commit_queued(shard: str) -> None:
+    """Commit the shard's queued writes as one transaction of their own.
+
+    Caller holds the shard lock, with no transaction open.  If the commit
+    itself fails, the writes go back on the front of the queue.
+    """
+    pending = _shards[shard].pending
+    batch = []
+    while pending:
+        batch.append(pending.popleft())
+    if not batch:
+        return
+    conn = _get_conn(shard)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _drain_pending(conn, batch)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        pending.extendleft(reversed(batch))
+        raise
+
+
+def _writer_loop() -> None:
+    # Open the shard connections up front so the first flush doesn't pay
+    try:
+        for name in _shards:
+            _get_conn(name)
+    except Exception:
+        logger.exception("Background DB writer could not open its connections")
+    next_candle_flush = time.monotonic() + _CANDLE_FLUSH_SEC
+    next_archive = time.monotonic() + _CANDLE_ARCHIVE_SEC
+    next_rollup = time.monotonic() + _PNL_ROLLUP_SEC
+    while True:
+        _pending_event.wait(_CANDLE_FLUSH_SEC)
+        time.sleep(_WRITE_COALESCE_SEC)  # let a burst accumulate
+        _pending_event.clear()
+        try:
+            now = time.monotonic()
+            if now >= next_candle_flush:
+                next_candle_flush = now + _CANDLE_FLUSH_SEC
+                _flush_candle_accum()
+            _commit_pending()
+            if now >= next_archive:
+                next_archive = now + _CANDLE_ARCHIVE_SEC
+                archive_candles()
+            if now >= next_rollup:
+                next_rollup = now + _PNL_ROLLUP_SEC
+                rollup_pnl()
+        except Exception:
+            logger.exception("Background DB writer failed")
+
+
+def _start_writer() -> None:
+    global _writer_thread
+    with _writer_lock:
+        if _writer_thread is None:
+            _writer_thread = threading.Thread(
+                target=_writer_loop, name="db-writer", daemon=True
+            )
+            _writer_thread.start()
+
+
+def _enqueue(sql: str, params: tuple, shard: str = _TRADING) -> None:
+    """Queue one write for the background writer (returns immediately)."""
+    if _writer_thread is None:
+        _start_writer()
+    _shards[shard].pending.append((sql, params))
+    _pending_event.set()
+
+
+def _commit_pending(names: Iterable[str] = tuple(_shards)) -> None:
+    for name in names:
+        sh = _shards[name]
+        if sh.pending:
+            with sh.lock:
+                if not _get_conn(name).in_transaction:
+                    _commit_queued(name)
+
+
+def flush_writes(shard: Optional[str] = None) -> None:
+    """Commit queued writes now (shutdown, or before a dependent read).
+
+    Flushes only ``shard`` when given, otherwise every shard.  Flushing the
+    market shard also writes the open candle buckets.
+    """
+    if shard is None or shard == _MARKET:
+        _flush_candle_accum()
+    _commit_pending((shard,) if shard is not None else tuple(_shards))
+
+
+atexit.register(flush_writes)
+
+
+# ---------------------------------------------------------------------------
+# WAL checkpoints
+# ---------------------------------------------------------------------------
+#
+# With wal_autocheckpoint=0 the WAL only shrinks when something checkpoints
+# it.  A daemon thread runs a PASSIVE checkpoint every couple of seconds on
+# its own connection, so it never holds a shard lock and never blocks a
+# writer; PASSIVE simply stops at frames a reader still needs.
+
+_CHECKPOINT_KINDS = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+
+def _checkpoint_loop(conn: sqlite3.Connection) -> None:
+    while True:
+        time.sleep(_CHECKPOINT_INTERVAL_SEC)
+        try:
+            busy, log, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            if log > 0:
+                logger.debug("WAL checkpoint: %d/%d frames (busy=%d)", done, log, busy)
+        except Exception:
+            logger.exception("Background WAL checkpoint failed")
+
+
+def _start_checkpointer() -> None:
+    global _checkpoint_thread
+    with _checkpoint_lock:
+        if _checkpoint_thread is None:
+            # Opened here, once, so the loop never reconnects
+            _checkpoint_thread = threading.Thread(
+                target=_checkpoint_loop,
+                args=(_connect(),),
+                name="db-checkpoint",
+                daemon=True,
+            )
+            _checkpoint_thread.start()
+
+
+def checkpoint_now(kind: str = "TRUNCATE") -> tuple[int, int, int]:
+    """Flush queued writes and checkpoint the WAL immediately.
+
+    ``kind`` is one of PASSIVE, FULL, RESTART or TRUNCATE; TRUNCATE (the
+    default, used at shutdown) also shrinks the WAL file to zero bytes.
+    Returns SQLite's ``(busy, log_frames, checkpointed_frames)``.
+    """
+    kind = kind.upper()
+    if kind not in _CHECKPOINT_KINDS:
+        raise ValueError(f"checkpoint_now: unknown checkpoint kind {kind!r}")
+    flush_writes()
+    with _shards[_TRADING].lock:
+        row = _get_conn().execute(f"PRAGMA wal_checkpoint({kind})").fetchone()
+    return tuple(row)
+
+
+def _checkpoint_at_exit() -> None:
+    if _shards[_TRADING].conn is not None:
+        checkpoint_now()
+
+
+atexit.register(_checkpoint_at_exit)
+
+
+# ---------------------------------------------------------------------------
+# Read caches
+# ---------------------------------------------------------------------------
+#
+# get_account / get_engine_state / get_position are polled on every tick but
+# change rarely.  Writers invalidate after their transaction commits; the
+# generation counter stops a reader that raced a writer from caching the
+# row it read before the write.
+
+_cache_lock = threading.Lock()
+_cache_gen = 0
+_account_cache: dict[str, dict] = {}
+_engine_state_cache: dict[str, str] = {}
+_position_cache: dict[tuple[str, str], Optional[dict]] = {}
+
+
+def _cache_store(cache: dict, key: Any, value: Any, gen: int) -> None:
+    with _cache_lock:
+        if gen == _cache_gen:
+            cache[key] = value
+
+
+def _invalidate_account(account_id: str) -> None:
+    global _cache_gen
+    with _cache_lock:
+        _cache_gen += 1
+        _account_cache.pop(account_id, None)
+        _engine_state_cache.pop(account_id, None)
+
+
+def _invalidate_positions(account_id: str, symbol: Optional[str] = None) -> None:
+    global _cache_gen
+    with _cache_lock:
+        _cache_gen += 1
+        if symbol is not None:
+            _position_cache.pop((account_id, symbol), None)
+            return
+        for key in [k for k in _position_cache if k[0] == account_id]:
+            del _position_cache[key]
+
+
+def _clear_read_caches() -> None:
+    global _cache_gen
+    with _cache_lock:
+        _cache_gen += 1
+        _account_cache.clear()
+        _engine_state_cache.clear()
+        _position_cache.clear()
 
 
 def _init_tables(conn: sqlite3.Connection) -> None:
@@ -129,6 +739,16 @@ def _init_tables(conn: sqlite3.Connection) -> None:
             capital        REAL
         );
 
+        -- One row per minute of pnl_history (its last snapshot); see
+        -- rollup_pnl().  bucket_ts is the minute's start, epoch seconds.
+        CREATE TABLE IF NOT EXISTS pnl_1m (
+            bucket_ts      INTEGER PRIMARY KEY,
+            realised_pnl   REAL,
+            unrealised_pnl REAL,
+            total_pnl      REAL,
+            capital        REAL
+        );
+
         -- â”€â”€ Strategy logs â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€
         CREATE TABLE IF NOT EXISTS strategy_logs (
             id         INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -140,8 +760,9 @@ def _init_tables(conn: sqlite3.Connection) -> None:
         );
 
         -- â”€â”€ Candles â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€â”€
+        -- Keyed directly on (symbol, timeframe, timestamp): no rowid
+        -- b-tree plus separate unique index to maintain on every insert.
         CREATE TABLE IF NOT EXISTS candles (
-            id         INTEGER PRIMARY KEY AUTOINCREMENT,
             symbol     TEXT NOT NULL,
             timeframe  TEXT NOT NULL DEFAULT '1m',
             timestamp  INTEGER NOT NULL,
@@ -150,11 +771,9 @@ def _init_tables(conn: sqlite3.Connection) -> None:
             low        REAL NOT NULL,
             close      REAL NOT NULL,
             volume     REAL NOT NULL DEFAULT 0,
-            UNIQUE(symbol, timeframe, timestamp)
-        );
+            PRIMARY KEY (symbol, timeframe, timestamp)
+        ) WITHOUT ROWID;
 
-        CREATE INDEX IF NOT EXISTS idx_candles_sym_tf
-            ON candles(symbol, timeframe, timestamp DESC);
         CREATE INDEX IF NOT EXISTS idx_positions_account
             ON positions(account_id);
         """
@@ -163,49 +782,97 @@ def _init_tables(conn: sqlite3.Connection) -> None:
 
     # â”€â”€ Safe migrations for existing databases â”€â”€
     _migrate_add_columns(conn)
+    _migrate_candles_without_rowid(conn)
+    _ensure_candle_counts(conn)
 
     # â”€â”€ Create indexes that depend on migrated columns â”€â”€
     # These must run AFTER migrations add account_id to older tables.
     try:
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_orders_account "
-            "ON orders(account_id, created_at DESC)"
+        conn.executescript(
+            """
+            CREATE INDEX IF NOT EXISTS idx_orders_account
+                ON orders(account_id, created_at DESC);
+            CREATE INDEX IF NOT EXISTS idx_trades_account
+                ON trades(account_id, timestamp DESC);
+            CREATE INDEX IF NOT EXISTS idx_orders_acct_status_time
+                ON orders(account_id, status, created_at DESC);
+            CREATE INDEX IF NOT EXISTS idx_trades_acct_sym_time
+                ON trades(account_id, symbol, timestamp DESC);
+            CREATE INDEX IF NOT EXISTS idx_orders_status_created
+                ON orders(status, created_at DESC);
+            CREATE INDEX IF NOT EXISTS idx_positions_account_qty
+                ON positions(account_id, qty);
+            CREATE INDEX IF NOT EXISTS idx_orders_created
+                ON orders(created_at DESC);
+            CREATE INDEX IF NOT EXISTS idx_pnl_ts
+                ON pnl_history(timestamp DESC);
+            """
+            # Only open orders are indexed, so it stays a page or two
+            f"""
+            CREATE INDEX IF NOT EXISTS idx_orders_open
+                ON orders(created_at DESC) WHERE {_OPEN_ORDER_PREDICATE};
+            """
         )
-        conn.execute(
-            "CREATE INDEX IF NOT EXISTS idx_trades_account "
-            "ON trades(account_id, timestamp DESC)"
-        )
-        conn.commit()
     except sqlite3.OperationalError:
         pass  # column may still not exist in edge cases
 
+    # Gather planner statistics once, so the indexes above get picked
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+    ).fetchone()
+    if not has_stats:
+        conn.execute("ANALYZE")
+    else:
+        # Open orders come and go, so refresh this (tiny) index's stats on
+        # every start; without them the planner may prefer the status index
+        conn.execute("ANALYZE idx_orders_open")
+
     logger.info("Database tables initialised at %s", DB_PATH)
 
 
+# Columns added after the first release: (table, column) -> full DDL
+_COLUMN_MIGRATIONS: dict[tuple[str, str], str] = {
+    ("orders", "account_id"): (
+        "ALTER TABLE orders ADD COLUMN account_id TEXT DEFAULT 'default'"
+    ),
+    ("trades", "account_id"): (
+        "ALTER TABLE trades ADD COLUMN account_id TEXT DEFAULT 'default'"
+    ),
+    ("trades", "pnl"): "ALTER TABLE trades ADD COLUMN pnl REAL DEFAULT 0",
+    ("pnl_history", "account_id"): (
+        "ALTER TABLE pnl_history ADD COLUMN account_id TEXT DEFAULT 'default'"
+    ),
+    ("accounts", "daily_loss_halted"): (
+        "ALTER TABLE accounts ADD COLUMN daily_loss_halted INTEGER DEFAULT 0"
+    ),
+    ("accounts", "engine_state"): (
+        "ALTER TABLE accounts ADD COLUMN engine_state TEXT DEFAULT 'IDLE'"
+    ),
+    ("accounts", "user_id"): (
+        "ALTER TABLE accounts ADD COLUMN user_id TEXT DEFAULT 'default'"
+    ),
+}
+
+
+def _existing_cols(conn: sqlite3.Connection, table: str) -> set[str]:
+    """Return the column names currently defined on *table*."""
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+
 def _migrate_add_columns(conn: sqlite3.Connection) -> None:
     """Add new columns to existing tables if they don't exist yet.
 
-    SQLite lacks ``ALTER TABLE â€¦ ADD COLUMN IF NOT EXISTS`` so we use
-    a try/except for each migration.
+    SQLite lacks ``ALTER TABLE â€¦ ADD COLUMN IF NOT EXISTS`` so each
+    table's columns are read once with ``PRAGMA table_info`` and only the
+    missing ones are added.  Everything runs in one transaction so a
+    fresh start costs a single commit instead of one per statement.
+    It begins IMMEDIATE: the column reads are followed by writes, and a
+    deferred transaction that has to upgrade can fail with SQLITE_BUSY
+    when another process is starting up against the same file.
     """
-    migrations = [
-        ("orders", "account_id", "TEXT DEFAULT 'default'"),
-        ("trades", "account_id", "TEXT DEFAULT 'default'"),
-        ("trades", "pnl", "REAL DEFAULT 0"),
-        ("pnl_history", "account_id", "TEXT DEFAULT 'default'"),
-        ("accounts", "daily_loss_halted", "INTEGER DEFAULT 0"),
-        ("accounts", "engine_state", "TEXT DEFAULT 'IDLE'"),
-    ]
-    for table, col, col_type in migrations:
-        try:
-            conn.execute(f"ALTER TABLE {table} ADD COLUMN {col} {col_type}")
-            conn.commit()
-            logger.info("Migration: added %s.%s", table, col)
-        except sqlite3.OperationalError:
-            pass  # column already exists
-
-    # -- Create users table for multi-user support --
+    conn.execute("BEGIN IMMEDIATE")
     try:
+        # -- Create users table for multi-user support --
         conn.execute(
             """CREATE TABLE IF NOT EXISTS users (
                 user_id    TEXT PRIMARY KEY,
@@ -214,17 +881,279 @@ def _migrate_add_columns(conn: sqlite3.Connection) -> None:
                 created_at TEXT NOT NULL
             )"""
         )
-        conn.commit()
-    except sqlite3.OperationalError:
-        pass
 
-    # -- Add user_id to accounts if missing --
-    try:
-        conn.execute("ALTER TABLE accounts ADD COLUMN user_id TEXT DEFAULT 'default'")
+        existing: dict[str, set[str]] = {}
+        for (table, col), ddl in _COLUMN_MIGRATIONS.items():
+            if table not in existing:
+                existing[table] = _existing_cols(conn, table)
+            if col not in existing[table]:
+                conn.execute(ddl)
+                logger.info("Migration: added %s.%s", table, col)
         conn.commit()
-        logger.info("Migration: added accounts.user_id")
-    except sqlite3.OperationalError:
-        pass
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _migrate_candles_without_rowid(conn: sqlite3.Connection) -> None:
+    """Rebuild a legacy ``candles`` table (rowid + UNIQUE) as WITHOUT ROWID.
+
+    SQLite cannot convert a table in place, so the rows are copied into a
+    new table which then replaces the old one.
+    """
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'candles'"
+    ).fetchone()
+    if row is None or "WITHOUT ROWID" in row[0].upper():
+        return
+
+    conn.executescript(
+        """
+        BEGIN IMMEDIATE;
+        CREATE TABLE candles_new (
+            symbol     TEXT NOT NULL,
+            timeframe  TEXT NOT NULL DEFAULT '1m',
+            timestamp  INTEGER NOT NULL,
+            open       REAL NOT NULL,
+            high       REAL NOT NULL,
+            low        REAL NOT NULL,
+            close      REAL NOT NULL,
+            volume     REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (symbol, timeframe, timestamp)
+        ) WITHOUT ROWID;
+        INSERT INTO candles_new
+            (symbol, timeframe, timestamp, open, high, low, close, volume)
+            SELECT symbol, timeframe, timestamp, open, high, low, close, volume
+            FROM candles;
+        DROP TABLE candles;
+        ALTER TABLE candles_new RENAME TO candles;
+        COMMIT;
+        """
+    )
+    logger.info("Migration: rebuilt candles as WITHOUT ROWID")
+
+
+def _ensure_candle_counts(conn: sqlite3.Connection) -> None:
+    """Create the per-(symbol, timeframe) candle counter and its trigger.
+
+    An upsert that merges into an existing candle takes the DO UPDATE path,
+    which fires UPDATE triggers only, so the INSERT trigger counts new rows
+    exactly.  archive_candles() deletes rows without touching the counters,
+    since archived candles still exist; reset_db clears both.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'candle_counts'"
+    ).fetchone()
+    if exists:
+        return
+    conn.executescript(
+        """
+        BEGIN IMMEDIATE;
+        CREATE TABLE candle_counts (
+            symbol    TEXT NOT NULL,
+            timeframe TEXT NOT NULL,
+            n         INTEGER NOT NULL,
+            PRIMARY KEY (symbol, timeframe)
+        ) WITHOUT ROWID;
+        INSERT INTO candle_counts (symbol, timeframe, n)
+            SELECT symbol, timeframe, COUNT(*) FROM candles
+            GROUP BY symbol, timeframe;
+        CREATE TRIGGER IF NOT EXISTS trg_candles_count
+            AFTER INSERT ON candles
+        BEGIN
+            INSERT INTO candle_counts (symbol, timeframe, n)
+                VALUES (NEW.symbol, NEW.timeframe, 1)
+                ON CONFLICT(symbol, timeframe) DO UPDATE SET n = n + 1;
+        END;
+        COMMIT;
+        """
+    )
+
+
+def _row_to_dict(fields: tuple[str, ...], row: tuple) -> dict:
+    """Zip a plain-tuple row into a dict, interning its ``symbol`` column."""
+    d = dict(zip(fields, row))
+    sym = d.get("symbol")
+    if sym is not None:
+        d["symbol"] = sys.intern(sym)
+    return d
+
+
+# ===========================================================================
+#  Row types
+# ===========================================================================
+# Bulk getters return these lightweight tuples instead of one dict per row;
+# fields double as the SELECT column lists.  Use as_dict() for JSON output.
+
+
+class Candle(NamedTuple):
+    symbol: str
+    timeframe: str
+    timestamp: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class Trade(NamedTuple):
+    trade_id: int
+    order_id: str
+    account_id: str
+    symbol: str
+    side: str
+    qty: int
+    price: float
+    pnl: float
+    timestamp: str
+
+
+class Position(NamedTuple):
+    id: int
+    account_id: str
+    symbol: str
+    side: str
+    qty: int
+    avg_price: float
+    updated_at: str
+
+
+def as_dict(row: NamedTuple) -> dict:
+    """Convert a Candle/Trade/Position to a plain dict (e.g. for jsonify)."""
+    return row._asdict()
+
+
+_CANDLE_COLS = ", ".join(Candle._fields)
+_TRADE_COLS = ", ".join(Trade._fields)
+_POSITION_COLS = ", ".join(Position._fields)
+# Dict-returning getters name their columns too, so a column added later
+# isn't decoded and shipped to every caller without anyone asking for it
+_ACCOUNT_FIELDS = (
+    "account_id",
+    "user_id",
+    "initial_capital",
+    "available_capital",
+    "realised_pnl",
+    "daily_loss_halted",
+    "engine_state",
+    "created_at",
+    "updated_at",
+)
+_ORDER_FIELDS = (
+    "order_id",
+    "account_id",
+    "symbol",
+    "side",
+    "qty",
+    "price",
+    "order_type",
+    "status",
+    "filled_qty",
+    "avg_price",
+    "strategy",
+    "created_at",
+    "updated_at",
+)
+_PNL_FIELDS = ("timestamp", "realised_pnl", "unrealised_pnl", "total_pnl", "capital")
+_USER_FIELDS = ("user_id", "username", "password", "created_at")
+_ACCOUNT_COLS = ", ".join(_ACCOUNT_FIELDS)
+_ORDER_COLS = ", ".join(_ORDER_FIELDS)
+_PNL_COLS = ", ".join(_PNL_FIELDS)
+
+
+# ===========================================================================
+#  SQL statements
+# ===========================================================================
+# Built once at import; passing the same string object every call also
+# lets sqlite3's statement cache skip re-parsing.
+
+_SQL_INSERT_USER = (
+    "INSERT INTO users (user_id, username, password, created_at) VALUES (?, ?, ?, ?)"
+)
+_SQL_SELECT_ACCOUNT = f"SELECT {_ACCOUNT_COLS} FROM accounts WHERE account_id = ?"
+_SQL_INSERT_ACCOUNT = """INSERT INTO accounts
+   (account_id, initial_capital, available_capital, realised_pnl,
+    created_at, updated_at)
+   VALUES (?, ?, ?, 0, ?, ?)"""
+# RETURNING (SQLite 3.35+) hands back the new row without a second SELECT
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+_SQL_INSERT_ACCOUNT_RETURNING = f"{_SQL_INSERT_ACCOUNT} RETURNING {_ACCOUNT_COLS}"
+# RETURNING hands REAL columns back without affinity (500.0 comes out as
+# 500), so these are coerced to match what a SELECT returns.
+_ACCOUNT_REAL_COLS = ("initial_capital", "available_capital", "realised_pnl")
+_SQL_UPDATE_ACCOUNT = """UPDATE accounts
+   SET available_capital = ?, realised_pnl = ?, updated_at = ?
+   WHERE account_id = ?"""
+_SQL_DELETE_POSITION = "DELETE FROM positions WHERE account_id = ? AND symbol = ?"
+_SQL_UPSERT_POSITION = """INSERT INTO positions
+   (account_id, symbol, side, qty, avg_price, updated_at)
+   VALUES (?, ?, ?, ?, ?, ?)
+   ON CONFLICT(account_id, symbol)
+   DO UPDATE SET
+       side       = excluded.side,
+       qty        = excluded.qty,
+       avg_price  = excluded.avg_price,
+       updated_at = excluded.updated_at"""
+_SQL_INSERT_ORDER = """INSERT INTO orders
+   (order_id, account_id, symbol, side, qty, price, order_type,
+    status, filled_qty, avg_price, strategy, created_at, updated_at)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+# Must match idx_orders_open's WHERE clause verbatim for the planner to use it
+_OPEN_ORDER_PREDICATE = "status IN ('NEW','ACK','PARTIAL')"
+# Fill updates always touch the same columns, so they share one statement
+_SQL_UPDATE_ORDER_FILL = """UPDATE orders
+   SET status = ?, filled_qty = ?, avg_price = ?, updated_at = ?
+   WHERE order_id = ?"""
+_SQL_INSERT_TRADE = """INSERT INTO trades
+   (order_id, account_id, symbol, side, qty, price, pnl, timestamp)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+_SQL_INSERT_PNL = """INSERT INTO pnl_history
+   (account_id, timestamp, realised_pnl, unrealised_pnl, total_pnl, capital)
+   VALUES (?, ?, ?, ?, ?, ?)"""
+_SQL_INSERT_STRATEGY_LOG = """INSERT INTO strategy_logs
+   (timestamp, strategy, symbol, signal, details)
+   VALUES (?, ?, ?, ?, ?)"""
+_SQL_UPSERT_CANDLE = """INSERT INTO candles
+   (symbol, timeframe, timestamp, open, high, low, close, volume)
+   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+   ON CONFLICT(symbol, timeframe, timestamp)
+   DO UPDATE SET
+       high   = MAX(candles.high, excluded.high),
+       low    = MIN(candles.low,  excluded.low),
+       close  = excluded.close,
+       volume = candles.volume + excluded.volume"""
+# Getter SELECTs are formatted here once too, not per call
+_SQL_SELECT_POSITIONS = (
+    f"SELECT {_POSITION_COLS} FROM positions WHERE account_id = ? AND qty > 0"
+)
+_SQL_SELECT_POSITION = (
+    f"SELECT {_POSITION_COLS} FROM positions WHERE account_id = ? AND symbol = ?"
+)
+_SQL_SELECT_ORDER = f"SELECT {_ORDER_COLS} FROM orders WHERE order_id = ?"
+_SQL_SELECT_ORDERS = (
+    f"SELECT {_ORDER_COLS} FROM orders ORDER BY created_at DESC LIMIT ? OFFSET ?"
+)
+_SQL_SELECT_OPEN_ORDERS = (
+    f"SELECT {_ORDER_COLS} FROM orders WHERE {_OPEN_ORDER_PREDICATE} "
+    "ORDER BY created_at DESC"
+)
+_SQL_SELECT_TRADES = f"""SELECT {_TRADE_COLS} FROM trades
+   WHERE account_id = ? ORDER BY timestamp DESC LIMIT ?"""
+_SQL_SELECT_PNL = f"SELECT {_PNL_COLS} FROM pnl_history ORDER BY timestamp DESC LIMIT ?"
+# The newest LIMIT candles, handed back oldest-first by SQLite itself
+_SQL_SELECT_CANDLES = f"""SELECT * FROM (
+       SELECT {_CANDLE_COLS} FROM candles
+       WHERE symbol = ? AND timeframe = ?
+       ORDER BY timestamp DESC
+       LIMIT ?)
+   ORDER BY timestamp"""
+_SQL_SELECT_CANDLES_NP = """SELECT * FROM (
+       SELECT timestamp, open, high, low, close, volume FROM candles
+       WHERE symbol = ? AND timeframe = ?
+       ORDER BY timestamp DESC
+       LIMIT ?)
+   ORDER BY timestamp"""
 
 
 # ===========================================================================
@@ -234,29 +1163,33 @@ def _migrate_add_columns(conn: sqlite3.Connection) -> None:
 
 def create_user(user_id: str, username: str, password_hash: str) -> dict:
     """Create a new user. Returns user dict."""
-    with _lock:
-        conn = _get_conn()
-        now = _utc_now()
-        conn.execute(
-            "INSERT INTO users (user_id, username, password, created_at) VALUES (?, ?, ?, ?)",
-            (user_id, username, password_hash, now),
-        )
-        conn.commit()
+    now = _utc_now()
+    _write(_SQL_INSERT_USER, (user_id, username, password_hash, now))
     return {"user_id": user_id, "username": username, "created_at": now}
 
 
 def get_user_by_username(username: str) -> Optional[dict]:
     """Look up a user by username."""
-    conn = _get_conn()
-    row = conn.execute("SELECT * FROM users WHERE username = ?", (username,)).fetchone()
-    return dict(row) if row else None
+    with _reader() as cur:
+        # password is the hash login() checks against
+        row = cur.execute(
+            "SELECT user_id, username, password, created_at FROM users "
+            "WHERE username = ?",
+            (username,),
+        ).fetchone()
+    return dict(zip(_USER_FIELDS, row)) if row else None
 
 
 def get_user_by_id(user_id: str) -> Optional[dict]:
-    """Look up a user by ID."""
-    conn = _get_conn()
-    row = conn.execute("SELECT * FROM users WHERE user_id = ?", (user_id,)).fetchone()
-    return dict(row) if row else None
+    """Look up a user by ID (without the password hash)."""
+    with _reader() as cur:
+        row = cur.execute(
+            "SELECT user_id, username, created_at FROM users WHERE user_id = ?",
+            (user_id,),
+        ).fetchone()
+    if not row:
+        return None
+    return {"user_id": row[0], "username": row[1], "created_at": row[2]}
 
 
 # ===========================================================================
@@ -270,41 +1203,42 @@ def ensure_default_account(initial_capital: float, account_id: str = "default")
     Returns the account dict.  If the account already exists it is
     returned as-is (capital is NOT reset â€” that's the whole point).
     """
-    with _lock:
-        conn = _get_conn()
-        row = conn.execute(
-            "SELECT * FROM accounts WHERE account_id = ?", (account_id,)
-        ).fetchone()
+    with _txn() as conn:
+        row = conn.execute(_SQL_SELECT_ACCOUNT, (account_id,)).fetchone()
         if row:
             return dict(row)
 
         now = _utc_now()
-        conn.execute(
-            """INSERT INTO accounts
-               (account_id, initial_capital, available_capital, realised_pnl,
-                created_at, updated_at)
-               VALUES (?, ?, ?, 0, ?, ?)""",
-            (account_id, initial_capital, initial_capital, now, now),
-        )
-        conn.commit()
+        params = (account_id, initial_capital, initial_capital, now, now)
+        if _HAS_RETURNING:
+            acct = dict(conn.execute(_SQL_INSERT_ACCOUNT_RETURNING, params).fetchone())
+            for col in _ACCOUNT_REAL_COLS:
+                acct[col] = float(acct[col])
+        else:
+            conn.execute(_SQL_INSERT_ACCOUNT, params)
+            acct = dict(conn.execute(_SQL_SELECT_ACCOUNT, (account_id,)).fetchone())
         logger.info(
             "Created account %s with initial_capital=%.2f",
             account_id,
             initial_capital,
         )
-        row = conn.execute(
-            "SELECT * FROM accounts WHERE account_id = ?", (account_id,)
-        ).fetchone()
-        return dict(row)
+    _invalidate_account(account_id)
+    return acct
 
 
 def get_account(account_id: str = "default") -> Optional[dict]:
-    """Return account dict or None."""
-    conn = _get_conn()
-    row = conn.execute(
-        "SELECT * FROM accounts WHERE account_id = ?", (account_id,)
-    ).fetchone()
-    return dict(row) if row else None
+    """Return account dict or None (served from cache while unchanged)."""
+    cached = _account_cache.get(account_id)
+    if cached is not None:
+        return dict(cached)
+    gen = _cache_gen
+    with _reader() as cur:
+        row = cur.execute(_SQL_SELECT_ACCOUNT, (account_id,)).fetchone()
+    if row is None:
+        return None
+    acct = dict(zip(_ACCOUNT_FIELDS, row))
+    _cache_store(_account_cache, account_id, acct, gen)
+    return dict(acct)
 
 
 def update_account(
@@ -313,67 +1247,57 @@ def update_account(
     realised_pnl: float,
 ) -> None:
     """Persist capital and realised PnL to the accounts table."""
-    with _lock:
-        conn = _get_conn()
-        conn.execute(
-            """UPDATE accounts
-               SET available_capital = ?, realised_pnl = ?, updated_at = ?
-               WHERE account_id = ?""",
-            (
-                available_capital,
-                realised_pnl,
-                _utc_now(),
-                account_id,
-            ),
-        )
-        conn.commit()
+    _write(
+        _SQL_UPDATE_ACCOUNT,
+        (available_capital, realised_pnl, _utc_now(), account_id),
+    )
+    _invalidate_account(account_id)
 
 
 def update_daily_loss_halted(account_id: str, halted: bool) -> None:
     """Persist daily_loss_halted flag to DB."""
-    with _lock:
-        conn = _get_conn()
-        conn.execute(
-            "UPDATE accounts SET daily_loss_halted = ? WHERE account_id = ?",
-            (1 if halted else 0, account_id),
-        )
-        conn.commit()
+    _write(
+        "UPDATE accounts SET daily_loss_halted = ? WHERE account_id = ?",
+        (1 if halted else 0, account_id),
+    )
+    _invalidate_account(account_id)
 
 
 def update_engine_state(state: str, account_id: str = "default") -> None:
     """Persist engine state to DB for auto-resume on restart."""
-    with _lock:
-        conn = _get_conn()
-        conn.execute(
-            "UPDATE accounts SET engine_state = ?, updated_at = ? WHERE account_id = ?",
-            (state, _utc_now(), account_id),
-        )
-        conn.commit()
+    _write(
+        "UPDATE accounts SET engine_state = ?, updated_at = ? WHERE account_id = ?",
+        (state, _utc_now(), account_id),
+    )
+    _invalidate_account(account_id)
 
 
 def get_engine_state(account_id: str = "default") -> str:
     """Get persisted engine state (for auto-resume)."""
-    conn = _get_conn()
-    row = conn.execute(
-        "SELECT engine_state FROM accounts WHERE account_id = ?", (account_id,)
-    ).fetchone()
-    if row:
-        try:
-            return row["engine_state"] or "IDLE"
-        except (IndexError, KeyError):
-            return "IDLE"
-    return "IDLE"
+    cached = _engine_state_cache.get(account_id)
+    if cached is not None:
+        return cached
+    gen = _cache_gen
+    with _reader() as cur:
+        row = cur.execute(
+            "SELECT engine_state FROM accounts WHERE account_id = ?", (account_id,)
+        ).fetchone()
+    if not row:
+        return "IDLE"
+    state = row[0] or "IDLE"
+    _cache_store(_engine_state_cache, account_id, state, gen)
+    return state
 
 
 def reset_account(account_id: str = "default", initial_capital: float = 0) -> None:
     """Reset an account to its initial state (for fresh demos)."""
-    with _lock:
-        conn = _get_conn()
-        acct = conn.execute(
-            "SELECT initial_capital FROM accounts WHERE account_id = ?",
-            (account_id,),
-        ).fetchone()
-        cap = initial_capital or (acct["initial_capital"] if acct else 1_000_000)
+    with _txn() as conn:
+        with _raw_cursor() as cur:
+            acct = cur.execute(
+                "SELECT initial_capital FROM accounts WHERE account_id = ?",
+                (account_id,),
+            ).fetchone()
+        cap = initial_capital or (acct[0] if acct else 1_000_000)
         now = _utc_now()
         conn.execute(
             """UPDATE accounts
@@ -382,8 +1306,9 @@ def reset_account(account_id: str = "default", initial_capital: float = 0) -> No
             (cap, now, account_id),
         )
         conn.execute("DELETE FROM positions WHERE account_id = ?", (account_id,))
-        conn.commit()
-        logger.info("Account %s reset to %.2f", account_id, cap)
+    _invalidate_account(account_id)
+    _invalidate_positions(account_id)
+    logger.info("Account %s reset to %.2f", account_id, cap)
 
 
 # ===========================================================================
@@ -403,61 +1328,57 @@ def upsert_position(
     If qty == 0, the position is deleted (FLAT).
     """
     now = _utc_now()
-    with _lock:
-        conn = _get_conn()
-        if qty <= 0:
-            conn.execute(
-                "DELETE FROM positions WHERE account_id = ? AND symbol = ?",
-                (account_id, symbol),
-            )
-        else:
-            conn.execute(
-                """INSERT INTO positions (account_id, symbol, side, qty, avg_price, updated_at)
-                   VALUES (?, ?, ?, ?, ?, ?)
-                   ON CONFLICT(account_id, symbol)
-                   DO UPDATE SET side = ?, qty = ?, avg_price = ?, updated_at = ?""",
-                (
-                    account_id,
-                    symbol,
-                    side,
-                    qty,
-                    avg_price,
-                    now,
-                    side,
-                    qty,
-                    avg_price,
-                    now,
-                ),
-            )
-        conn.commit()
+    with _txn() as conn:
+        _write_position(conn, account_id, symbol, side, qty, avg_price, now)
+    _invalidate_positions(account_id, symbol)
+
+
+def _write_position(
+    conn: sqlite3.Connection,
+    account_id: str,
+    symbol: str,
+    side: str,
+    qty: int,
+    avg_price: float,
+    now: str,
+) -> None:
+    """Upsert (or, for qty <= 0, delete) a position inside an open transaction."""
+    if qty <= 0:
+        conn.execute(_SQL_DELETE_POSITION, (account_id, symbol))
+    else:
+        conn.execute(
+            _SQL_UPSERT_POSITION, (account_id, symbol, side, qty, avg_price, now)
+        )
 
 
-def get_positions(account_id: str = "default") -> list[dict]:
+def get_positions(account_id: str = "default") -> list[Position]:
     """Return all open positions for an account."""
-    conn = _get_conn()
-    rows = conn.execute(
-        "SELECT * FROM positions WHERE account_id = ? AND qty > 0",
-        (account_id,),
-    ).fetchall()
-    return [dict(r) for r in rows]
+    with _reader() as cur:
+        rows = cur.execute(_SQL_SELECT_POSITIONS, (account_id,)).fetchall()
+    return [Position(r[0], r[1], sys.intern(r[2]), *r[3:]) for r in rows]
 
 
 def get_position(symbol: str, account_id: str = "default") -> Optional[dict]:
-    """Return a single position dict or None."""
-    conn = _get_conn()
-    row = conn.execute(
-        "SELECT * FROM positions WHERE account_id = ? AND symbol = ?",
-        (account_id, symbol),
-    ).fetchone()
-    return dict(row) if row else None
+    """Return a single position dict or None (served from cache while unchanged)."""
+    key = (account_id, symbol)
+    try:
+        cached = _position_cache[key]
+    except KeyError:
+        pass
+    else:
+        return dict(cached) if cached is not None else None
+    gen = _cache_gen
+    with _reader() as cur:
+        row = cur.execute(_SQL_SELECT_POSITION, (account_id, symbol)).fetchone()
+    pos = _row_to_dict(Position._fields, row) if row else None
+    _cache_store(_position_cache, key, pos, gen)
+    return dict(pos) if pos is not None else None
 
 
 def delete_all_positions(account_id: str = "default") -> None:
     """Remove all positions for an account."""
-    with _lock:
-        conn = _get_conn()
-        conn.execute("DELETE FROM positions WHERE account_id = ?", (account_id,))
-        conn.commit()
+    _write("DELETE FROM positions WHERE account_id = ?", (account_id,))
+    _invalidate_positions(account_id)
 
 
 # ===========================================================================
@@ -465,70 +1386,101 @@ def delete_all_positions(account_id: str = "default") -> None:
 # ===========================================================================
 
 
+def _order_params(order: dict[str, Any], now: Optional[str] = None) -> tuple:
+    # The clock is read only when the order carries no timestamp of its own
+    created = order.get("created_at") or now or _utc_now()
+    return (
+        order["order_id"],
+        order.get("account_id", "default"),
+        order["symbol"],
+        order["side"],
+        order["qty"],
+        order.get("price"),
+        order.get("order_type", "MARKET"),
+        order.get("status", "NEW"),
+        order.get("filled_qty", 0),
+        order.get("avg_price", 0),
+        order.get("strategy"),
+        created,
+        order.get("updated_at") or created,
+    )
+
+
 def insert_order(order: dict[str, Any]) -> None:
-    """Insert a new order row."""
-    with _lock:
-        conn = _get_conn()
-        conn.execute(
-            """INSERT INTO orders
-               (order_id, account_id, symbol, side, qty, price, order_type,
-                status, filled_qty, avg_price, strategy, created_at, updated_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                order["order_id"],
-                order.get("account_id", "default"),
-                order["symbol"],
-                order["side"],
-                order["qty"],
-                order.get("price"),
-                order.get("order_type", "MARKET"),
-                order.get("status", "NEW"),
-                order.get("filled_qty", 0),
-                order.get("avg_price", 0),
-                order.get("strategy"),
-                order.get("created_at", _utc_now()),
-                order.get("updated_at", _utc_now()),
-            ),
+    """Queue a new order row (see ``flush_writes``)."""
+    _enqueue(_SQL_INSERT_ORDER, _order_params(order))
+
+
+def insert_orders_many(orders: list[dict[str, Any]]) -> None:
+    """Insert many orders in one transaction (replay / backfill)."""
+    if not orders:
+        return
+    now = _utc_now()
+    params = [_order_params(o, now) for o in orders]
+    with _txn() as conn:
+        conn.executemany(_SQL_INSERT_ORDER, params)
+
+
+# Columns update_order() may touch; anything else is rejected
+_ALLOWED_ORDER_COLS = frozenset(
+    {"status", "filled_qty", "avg_price", "price", "qty", "strategy"}
+)
+
+
+# One interned UPDATE per sorted key set; at most 63, since keys are whitelisted
+_UPDATE_CACHE: dict[tuple[str, ...], str] = {}
+
+
+def _order_update_sql(keys: tuple[str, ...]) -> str:
+    """UPDATE statement for a sorted tuple of column names.
+
+    A key set is validated once, when its statement is first built; later
+    calls are a single dict lookup.
+    """
+    sql = _UPDATE_CACHE.get(keys)
+    if sql is None:
+        unknown = set(keys) - _ALLOWED_ORDER_COLS
+        if unknown:
+            raise ValueError(f"update_order: unknown column(s) {sorted(unknown)}")
+        set_clause = ", ".join(f"{k} = ?" for k in keys)
+        sql = _UPDATE_CACHE.setdefault(
+            keys, f"UPDATE orders SET {set_clause}, updated_at = ? WHERE order_id = ?"
         )
-        conn.commit()
+    return sql
 
 
 def update_order(order_id: str, updates: dict[str, Any]) -> None:
-    """Update order fields by order_id."""
-    with _lock:
-        conn = _get_conn()
-        updates["updated_at"] = _utc_now()
-        set_clause = ", ".join(f"{k} = ?" for k in updates)
-        values = list(updates.values()) + [order_id]
-        conn.execute(f"UPDATE orders SET {set_clause} WHERE order_id = ?", values)
-        conn.commit()
+    """Update order fields by order_id.
+
+    Raises ``ValueError`` for a column outside ``_ALLOWED_ORDER_COLS``.
+    """
+    keys = tuple(sorted(updates))
+    sql = _order_update_sql(keys)
+    values = [updates[k] for k in keys]
+    values += (_utc_now(), order_id)
+    _write(sql, values)
 
 
 def get_order(order_id: str) -> Optional[dict]:
     """Return a single order dict or None."""
-    conn = _get_conn()
-    row = conn.execute(
-        "SELECT * FROM orders WHERE order_id = ?", (order_id,)
-    ).fetchone()
-    return dict(row) if row else None
+    flush_writes(_TRADING)
+    with _reader() as cur:
+        row = cur.execute(_SQL_SELECT_ORDER, (order_id,)).fetchone()
+    return dict(zip(_ORDER_FIELDS, row)) if row else None
 
 
 def get_all_orders(limit: int = 100, offset: int = 0) -> list[dict]:
-    conn = _get_conn()
-    rows = conn.execute(
-        "SELECT * FROM orders ORDER BY created_at DESC LIMIT ? OFFSET ?",
-        (limit, offset),
-    ).fetchall()
-    return [dict(r) for r in rows]
+    flush_writes(_TRADING)
+    with _reader() as cur:
+        rows = cur.execute(_SQL_SELECT_ORDERS, (limit, offset)).fetchall()
+    return [dict(zip(_ORDER_FIELDS, r)) for r in rows]
 
 
 def get_open_orders() -> list[dict]:
-    conn = _get_conn()
-    rows = conn.execute(
-        "SELECT * FROM orders WHERE status IN ('NEW','ACK','PARTIAL') "
-        "ORDER BY created_at DESC"
-    ).fetchall()
-    return [dict(r) for r in rows]
+    flush_writes(_TRADING)
+    with _reader() as cur:
+        rows = cur.execute(_SQL_SELECT_OPEN_ORDERS).fetchall()
+    return [_row_to_dict(_ORDER_FIELDS, r) for r in rows]
 
 
 # ===========================================================================
@@ -536,71 +1488,100 @@ def get_open_orders() -> list[dict]:
 # ===========================================================================
 
 
+def _trade_params(trade: dict[str, Any], now: Optional[str] = None) -> tuple:
+    return (
+        trade["order_id"],
+        trade.get("account_id", "default"),
+        trade["symbol"],
+        trade["side"],
+        trade["qty"],
+        trade["price"],
+        trade.get("pnl", 0),
+        trade.get("timestamp") or now or _utc_now(),
+    )
+
+
 def insert_trade(trade: dict[str, Any]) -> None:
-    with _lock:
-        conn = _get_conn()
-        conn.execute(
-            """INSERT INTO trades
-               (order_id, account_id, symbol, side, qty, price, pnl, timestamp)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                trade["order_id"],
-                trade.get("account_id", "default"),
-                trade["symbol"],
-                trade["side"],
-                trade["qty"],
-                trade["price"],
-                trade.get("pnl", 0),
-                trade.get("timestamp", _utc_now()),
-            ),
-        )
-        conn.commit()
+    _enqueue(_SQL_INSERT_TRADE, _trade_params(trade))
+
+
+def insert_trades_many(trades: list[dict[str, Any]]) -> None:
+    """Insert many trades in one transaction (replay / backfill)."""
+    if not trades:
+        return
+    now = _utc_now()
+    params = [_trade_params(t, now) for t in trades]
+    with _txn() as conn:
+        conn.executemany(_SQL_INSERT_TRADE, params)
+
+
+def _order_fill_params(order: dict[str, Any], now: str) -> tuple:
+    return (
+        order.get("status", "FILLED"),
+        order.get("filled_qty", 0),
+        order.get("avg_price", 0),
+        now,
+        order["order_id"],
+    )
 
 
 def insert_order_and_trade(order: dict[str, Any], trade: dict[str, Any]) -> None:
     """Insert/update an order and its trade fill in a single transaction."""
-    with _lock:
-        conn = _get_conn()
-        try:
-            conn.execute("BEGIN")
-            now = _utc_now()
-            updates = {
-                "status": order.get("status", "FILLED"),
-                "filled_qty": order.get("filled_qty", 0),
-                "avg_price": order.get("avg_price", 0),
-                "updated_at": now,
-            }
-            set_clause = ", ".join(f"{k} = ?" for k in updates)
-            values = list(updates.values()) + [order["order_id"]]
-            conn.execute(f"UPDATE orders SET {set_clause} WHERE order_id = ?", values)
-            conn.execute(
-                """INSERT INTO trades
-                   (order_id, account_id, symbol, side, qty, price, pnl, timestamp)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    trade["order_id"],
-                    trade.get("account_id", "default"),
-                    trade["symbol"],
-                    trade["side"],
-                    trade["qty"],
-                    trade["price"],
-                    trade.get("pnl", 0),
-                    trade.get("timestamp", now),
-                ),
-            )
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
+    with _txn() as conn:
+        now = _utc_now()
+        conn.execute(_SQL_UPDATE_ORDER_FILL, _order_fill_params(order, now))
+        conn.execute(_SQL_INSERT_TRADE, _trade_params(trade, now))
 
 
-def get_trades(limit: int = 200, account_id: str = "default") -> list[dict]:
-    conn = _get_conn()
-    rows = conn.execute(
-        "SELECT * FROM trades WHERE account_id = ? ORDER BY timestamp DESC LIMIT ?",
-        (account_id, limit),
-    ).fetchall()
-    return [dict(r) for r in rows]
+def record_fill(
+    account_update: dict[str, Any],
+    position_update: dict[str, Any],
+    trade: dict[str, Any],
+    order: Optional[dict[str, Any]] = None,
+) -> None:
+    """Persist everything one fill changes in a single transaction.
+
+    ``account_update`` carries ``account_id``, ``available_capital`` and
+    ``realised_pnl``; ``position_update`` carries ``symbol``, ``side``,
+    ``qty`` and ``avg_price`` (qty <= 0 deletes the row).  When ``order``
+    is given its fill columns are updated too.  One commit means one WAL
+    sync per fill, and a crash can't leave capital and positions disagreeing.
+    """
+    account_id = account_update.get("account_id", "default")
+    pos_account = position_update.get("account_id", account_id)
+    symbol = position_update["symbol"]
+    with _txn() as conn:
+        now = _utc_now()
+        conn.execute(
+            _SQL_UPDATE_ACCOUNT,
+            (
+                account_update["available_capital"],
+                account_update["realised_pnl"],
+                now,
+                account_id,
+            ),
+        )
+        _write_position(
+            conn,
+            pos_account,
+            symbol,
+            position_update["side"],
+            position_update["qty"],
+            position_update["avg_price"],
+            now,
+        )
+        if order is not None:
+            conn.execute(_SQL_UPDATE_ORDER_FILL, _order_fill_params(order, now))
+        conn.execute(_SQL_INSERT_TRADE, _trade_params(trade, now))
+    _invalidate_account(account_id)
+    _invalidate_positions(pos_account, symbol)
+
+
+def get_trades(limit: int = 200, account_id: str = "default") -> list[Trade]:
+    flush_writes(_TRADING)
+    with _reader() as cur:
+        rows = cur.execute(_SQL_SELECT_TRADES, (account_id, limit)).fetchall()
+    return [Trade._make(r) for r in rows]
 
 
 # ===========================================================================
@@ -609,30 +1590,81 @@ def get_trades(limit: int = 200, account_id: str = "default") -> list[dict]:
 
 
 def insert_pnl_snapshot(snapshot: dict[str, Any]) -> None:
-    with _lock:
-        conn = _get_conn()
-        conn.execute(
-            """INSERT INTO pnl_history
-               (account_id, timestamp, realised_pnl, unrealised_pnl, total_pnl, capital)
-               VALUES (?, ?, ?, ?, ?, ?)""",
-            (
-                snapshot.get("account_id", "default"),
-                snapshot.get("timestamp", _utc_now()),
-                snapshot.get("realised_pnl", 0),
-                snapshot.get("unrealised_pnl", 0),
-                snapshot.get("total_pnl", 0),
-                snapshot.get("capital", 0),
-            ),
-        )
-        conn.commit()
+    _enqueue(
+        _SQL_INSERT_PNL,
+        (
+            snapshot.get("account_id", "default"),
+            snapshot.get("timestamp") or _utc_now_fast(),
+            snapshot.get("realised_pnl", 0),
+            snapshot.get("unrealised_pnl", 0),
+            snapshot.get("total_pnl", 0),
+            snapshot.get("capital", 0),
+        ),
+        _LOGS,
+    )
 
 
-def get_pnl_history(limit: int = 500) -> list[dict]:
-    conn = _get_conn()
-    rows = conn.execute(
-        "SELECT * FROM pnl_history ORDER BY timestamp DESC LIMIT ?", (limit,)
-    ).fetchall()
-    return [dict(r) for r in rows]
+# One row per minute of pnl_history from {since} on; the minute's last
+# snapshot wins (SQLite returns the bare columns from the MAX(timestamp) row)
+_SQL_PNL_MINUTES = """SELECT bucket, realised_pnl, unrealised_pnl, total_pnl, capital
+   FROM (
+       SELECT CAST(strftime('%s', timestamp) AS INTEGER) / 60 * 60 AS bucket,
+              MAX(timestamp), realised_pnl, unrealised_pnl, total_pnl, capital
+       FROM pnl_history
+       WHERE timestamp >= {since}
+       GROUP BY bucket)"""
+_SQL_ROLLUP_PNL = """INSERT OR REPLACE INTO pnl_1m
+   (bucket_ts, realised_pnl, unrealised_pnl, total_pnl, capital)
+   """ + _SQL_PNL_MINUTES.format(since="?")
+_SQL_LAST_PNL_BUCKET = (
+    "SELECT strftime('%Y-%m-%dT%H:%M:%S', MAX(bucket_ts), 'unixepoch') FROM pnl_1m"
+)
+# Read-only: closed minutes come from pnl_1m, while the newest rolled-up
+# minute (possibly rolled up while open) and everything after it are
+# aggregated from pnl_history in the query.
+_SQL_PNL_LIVE_TAIL = _SQL_PNL_MINUTES.format(
+    since="(SELECT strftime('%Y-%m-%dT%H:%M:%S', ts, 'unixepoch') FROM last)"
+)
+_SQL_SELECT_PNL_1M = f"""WITH last(ts) AS (
+       SELECT COALESCE(MAX(bucket_ts), 0) FROM pnl_1m)
+   SELECT strftime('%Y-%m-%dT%H:%M:%S+00:00', bucket_ts, 'unixepoch'),
+          {", ".join(_PNL_FIELDS[1:])}
+   FROM (
+       SELECT bucket_ts, {", ".join(_PNL_FIELDS[1:])} FROM pnl_1m
+       WHERE bucket_ts < (SELECT ts FROM last)
+       UNION ALL
+       {_SQL_PNL_LIVE_TAIL})
+   ORDER BY bucket_ts DESC LIMIT ?"""
+
+_PNL_RESOLUTIONS = ("raw", "1m")
+
+
+def rollup_pnl() -> None:
+    """Fold PnL snapshots into ``pnl_1m``, starting at its newest minute.
+
+    That minute is rebuilt because it may have been rolled up while still
+    open.  Relies on snapshot timestamps being UTC ISO 8601, so the text
+    comparison on ``pnl_history.timestamp`` is chronological.
+    """
+    with _txn(_LOGS) as conn:
+        since = conn.execute(_SQL_LAST_PNL_BUCKET).fetchone()[0] or ""
+        conn.execute(_SQL_ROLLUP_PNL, (since,))
+
+
+def get_pnl_history(limit: int = 500, resolution: str = "raw") -> list[dict]:
+    """Return the newest *limit* PnL snapshots, newest first.
+
+    ``resolution="1m"`` reads the per-minute rollup instead, one row per
+    minute with that minute's last snapshot.  Minutes the writer has not
+    rolled up yet are aggregated in the query, so this never writes.
+    """
+    if resolution not in _PNL_RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {_PNL_RESOLUTIONS}")
+    flush_writes(_LOGS)
+    sql = _SQL_SELECT_PNL_1M if resolution == "1m" else _SQL_SELECT_PNL
+    with _reader() as cur:
+        rows = cur.execute(sql, (limit,)).fetchall()
+    return [dict(zip(_PNL_FIELDS, r)) for r in rows]
 
 
 # ===========================================================================
@@ -641,20 +1673,17 @@ def get_pnl_history(limit: int = 500) -> list[dict]:
 
 
 def insert_strategy_log(log: dict[str, Any]) -> None:
-    with _lock:
-        conn = _get_conn()
-        conn.execute(
-            """INSERT INTO strategy_logs (timestamp, strategy, symbol, signal, details)
-               VALUES (?, ?, ?, ?, ?)""",
-            (
-                log.get("timestamp", _utc_now()),
-                log.get("strategy"),
-                log.get("symbol"),
-                log.get("signal"),
-                json.dumps(log.get("details", {})),
-            ),
-        )
-        conn.commit()
+    _enqueue(
+        _SQL_INSERT_STRATEGY_LOG,
+        (
+            log.get("timestamp") or _utc_now_fast(),
+            log.get("strategy"),
+            log.get("symbol"),
+            log.get("signal"),
+            _dumps(log.get("details") or {}),
+        ),
+        _LOGS,
+    )
 
 
 # ===========================================================================
@@ -662,6 +1691,151 @@ def insert_strategy_log(log: dict[str, Any]) -> None:
 # ===========================================================================
 
 
+# In-memory tail of recent candles per (symbol, timeframe).  A buffer is
+# created only by a get_recent_candles() miss (primed from the DB) and then
+# kept current by every upsert, so it always holds the newest rows.
+_CANDLE_BUFFER_LEN = 2048
+# Re-entrant: archive_candles() holds it across flush_writes()
+_candle_lock = threading.RLock()
+_candle_buffers: dict[tuple[str, str], deque[Candle]] = {}
+# Keys whose buffer was primed from a DB read that came back short, i.e.
+# holds the whole series (until it fills up to _CANDLE_BUFFER_LEN)
+_candle_complete: set[tuple[str, str]] = set()
+# Bumped by every upsert call; a buffer primed from a read that raced an
+# upsert would miss that upsert, so get_recent_candles() then skips it
+_candle_gen = 0
+# Open (not yet queued) bucket per (symbol, timeframe), as a mutable row
+# in _SQL_UPSERT_CANDLE parameter order
+_candle_accum: dict[tuple[str, str], list] = {}
+
+
+def _open_bucket(key: tuple[str, str], row: list) -> None:
+    """Make ``row`` the open bucket for ``key``; caller holds ``_candle_lock``.
+
+    The bucket it replaces (a different timestamp) is closed and queued.
+    Queued buckets still go through the UPSERT, so a bucket flushed early
+    merges with its own partial row exactly as the separate ticks would.
+    """
+    acc = _candle_accum.get(key)
+    if acc is not None:
+        _enqueue(_SQL_UPSERT_CANDLE, tuple(acc), _MARKET)
+    elif _writer_thread is None:
+        _start_writer()  # the writer also flushes buckets that never close
+    _candle_accum[key] = row
+
+
+def _flush_candle_accum() -> None:
+    """Queue every open bucket for the market shard."""
+    with _candle_lock:
+        if _candle_accum:
+            for acc in _candle_accum.values():
+                _enqueue(_SQL_UPSERT_CANDLE, tuple(acc), _MARKET)
+            _candle_accum.clear()
+
+
+def _buffer_candle(c: Candle) -> None:
+    """Apply one upsert to its buffer, if any; caller holds ``_candle_lock``."""
+    key = (c.symbol, c.timeframe)
+    buf = _candle_buffers.get(key)
+    if buf is None:
+        return
+    last = buf[-1] if buf else None
+    if last is None or c.timestamp > last.timestamp:
+        buf.append(c)
+    elif c.timestamp == last.timestamp:
+        # Same merge rule as the ON CONFLICT clause of _SQL_UPSERT_CANDLE
+        buf[-1] = last._replace(
+            high=max(last.high, c.high),
+            low=min(last.low, c.low),
+            close=c.close,
+            volume=last.volume + c.volume,
+        )
+    else:
+        # Out-of-order candle: rebuild from the DB on the next read
+        del _candle_buffers[key]
+        _candle_complete.discard(key)
+
+
+def upsert_candles_bulk(candles: list[dict[str, Any]]) -> None:
+    """Merge many candle upserts into the open buckets.
+
+    Rows are applied in order, so two candles for the same key within one
+    batch merge exactly as two ``upsert_candle`` calls would.  Nothing is
+    written until a bucket closes or the next periodic/explicit flush.
+    """
+    global _candle_gen
+    with _candle_lock:
+        _candle_gen += 1
+        accum_get = _candle_accum.get
+        for c in candles:
+            # Parsed straight into locals and merged in place: the common
+            # case (another tick for the open bucket) allocates only the key
+            symbol = c["symbol"]
+            timeframe = c.get("timeframe", "1m")
+            ts = int(c["timestamp"])
+            close = c.get("close", 0)
+            high = float(c.get("high", close))
+            low = float(c.get("low", close))
+            close = float(close)
+            volume = float(c.get("volume", 0))
+            key = (symbol, timeframe)
+            acc = accum_get(key)
+            if acc is not None and acc[2] == ts:
+                # Same merge rule as the ON CONFLICT clause of _SQL_UPSERT_CANDLE
+                if high > acc[4]:
+                    acc[4] = high
+                if low < acc[5]:
+                    acc[5] = low
+                acc[6] = close
+                acc[7] += volume
+            else:
+                open_ = float(c.get("open", close))
+                _open_bucket(
+                    key, [symbol, timeframe, ts, open_, high, low, close, volume]
+                )
+            if _candle_buffers:
+                _buffer_candle(
+                    Candle(
+                        symbol,
+                        timeframe,
+                        ts,
+                        float(c.get("open", close)),
+                        high,
+                        low,
+                        close,
+                        volume,
+                    )
+                )
+
+
+def upsert_candle_rows(rows: Iterable[tuple]) -> None:
+    """``upsert_candles_bulk`` for rows already in :class:`Candle` field order.
+
+    Each row is ``(symbol, timeframe, timestamp, open, high, low, close,
+    volume)`` with int/float numerics, so there is no per-field dict parse.
+    The tick loop builds these straight from each tick.
+    """
+    global _candle_gen
+    with _candle_lock:
+        _candle_gen += 1
+        accum_get = _candle_accum.get
+        for row in rows:
+            symbol, timeframe, ts, open_, high, low, close, volume = row
+            key = (symbol, timeframe)
+            acc = accum_get(key)
+            if acc is not None and acc[2] == ts:
+                if high > acc[4]:
+                    acc[4] = high
+                if low < acc[5]:
+                    acc[5] = low
+                acc[6] = close
+                acc[7] += volume
+            else:
+                _open_bucket(key, list(row))
+            if _candle_buffers:
+                _buffer_candle(Candle._make(row))
+
+
 def upsert_candle(candle: dict[str, Any]) -> None:
     """Insert or update a candle row (keyed by symbol+timeframe+timestamp).
 
@@ -669,29 +1843,17 @@ def upsert_candle(candle: dict[str, Any]) -> None:
     high takes the max, low takes the min, close is overwritten, volume is accumulated.
     This ensures ticks arriving within the same candle window are merged correctly.
     """
-    with _lock:
-        conn = _get_conn()
-        conn.execute(
-            """INSERT INTO candles (symbol, timeframe, timestamp, open, high, low, close, volume)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-               ON CONFLICT(symbol, timeframe, timestamp)
-               DO UPDATE SET
-                   high   = MAX(candles.high, excluded.high),
-                   low    = MIN(candles.low,  excluded.low),
-                   close  = excluded.close,
-                   volume = candles.volume + excluded.volume""",
-            (
-                candle["symbol"],
-                candle.get("timeframe", "1m"),
-                int(candle["timestamp"]),
-                float(candle.get("open", candle.get("close", 0))),
-                float(candle.get("high", candle.get("close", 0))),
-                float(candle.get("low", candle.get("close", 0))),
-                float(candle.get("close", 0)),
-                float(candle.get("volume", 0)),
-            ),
-        )
-        conn.commit()
+    upsert_candles_bulk([candle])
+
+
+def upsert_candle_sync(candle: dict[str, Any]) -> None:
+    """``upsert_candle`` that returns only once the row is committed.
+
+    For tests and scripts that read the table straight back, or whose
+    process may exit before the background writer runs.
+    """
+    upsert_candles_bulk([candle])
+    flush_writes(_MARKET)
 
 
 # Alias for backward compatibility
@@ -700,30 +1862,145 @@ insert_or_update_candle = upsert_candle
 
 def get_recent_candles(
     symbol: str, timeframe: str = "1m", limit: int = 500
-) -> list[dict]:
-    """Return the most recent *limit* candles sorted ascending by timestamp."""
-    conn = _get_conn()
-    rows = conn.execute(
-        """SELECT symbol, timeframe, timestamp, open, high, low, close, volume
-           FROM candles
-           WHERE symbol = ? AND timeframe = ?
-           ORDER BY timestamp DESC
-           LIMIT ?""",
-        (symbol, timeframe, limit),
-    ).fetchall()
-    return [dict(r) for r in reversed(rows)]
+) -> list[Candle]:
+    """Return the most recent *limit* candles sorted ascending by timestamp.
+
+    Served from the in-memory buffer when it holds at least *limit* rows or
+    the whole series.  Otherwise read from SQLite (and the archive), which
+    also (re)primes the buffer.  The read runs outside ``_candle_lock`` so
+    tick-loop upserts never wait behind a chart read.
+    """
+    key = (symbol, timeframe)
+    with _candle_lock:
+        buf = _candle_buffers.get(key)
+        if buf is not None and (
+            len(buf) >= limit
+            or (key in _candle_complete and len(buf) < _CANDLE_BUFFER_LEN)
+        ):
+            return list(buf)[-limit:]
+        gen = _candle_gen
+    flush_writes(_MARKET)
+    with _reader() as cur:
+        rows = cur.execute(_SQL_SELECT_CANDLES, (symbol, timeframe, limit)).fetchall()
+    candles = list(map(Candle._make, rows))
+    store = _get_candle_store()
+    if store is not None and len(candles) < limit:
+        before = candles[0].timestamp if candles else _MAX_TS
+        older = store.read_tail(symbol, timeframe, limit - len(candles), before)
+        candles[:0] = [
+            Candle(symbol, timeframe, int(r[0]), *r[1:]) for r in older.tolist()
+        ]
+    with _candle_lock:
+        # An upsert since the read isn't in `candles`; prime on a later call
+        if _candle_gen == gen:
+            _candle_buffers[key] = deque(candles, maxlen=_CANDLE_BUFFER_LEN)
+            if len(candles) < limit:
+                _candle_complete.add(key)
+            else:
+                _candle_complete.discard(key)
+    return candles
+
+
+_NP_CANDLE_FIELDS = candle_store.NP_FIELDS
+
+
+def get_recent_candles_np(
+    symbol: str, timeframe: str = "1m", limit: int = 500
+) -> dict[str, np.ndarray]:
+    """Column-oriented ``get_recent_candles`` for vectorised indicator code.
+
+    Returns ``{"timestamp": int64[n], "open": float64[n], ...}`` in
+    ascending time order, built from one contiguous ``(n, 6)`` buffer.
+    """
+    flush_writes(_MARKET)
+    with _reader() as cur:
+        rows = cur.execute(
+            _SQL_SELECT_CANDLES_NP, (symbol, timeframe, limit)
+        ).fetchall()
+    data = np.array(rows, dtype=np.float64).reshape(-1, 6)
+    store = _get_candle_store()
+    if store is not None and len(data) < limit:
+        before = int(data[0, 0]) if len(data) else _MAX_TS
+        older = store.read_tail(symbol, timeframe, limit - len(data), before)
+        data = np.concatenate((older, data))
+    cols = {
+        name: np.ascontiguousarray(data[:, i])
+        for i, name in enumerate(_NP_CANDLE_FIELDS)
+    }
+    cols["timestamp"] = cols["timestamp"].astype(np.int64)
+    return cols
 
 
 # Keep old name working as an alias
 get_candles = get_recent_candles
 
 
+# Bucket timestamps are epoch seconds; "before" for a series with no rows
+_MAX_TS = 1 << 62
+
+_SQL_SELECT_CANDLES_TO_ARCHIVE = """SELECT symbol, timeframe, timestamp,
+       open, high, low, close, volume FROM (
+       SELECT *, ROW_NUMBER() OVER (
+           PARTITION BY symbol, timeframe ORDER BY timestamp DESC) AS rn
+       FROM candles)
+   WHERE rn > ?
+   ORDER BY symbol, timeframe, timestamp"""
+_SQL_DELETE_CANDLE = (
+    "DELETE FROM candles WHERE symbol = ? AND timeframe = ? AND timestamp = ?"
+)
+
+_candle_store: Optional[candle_store.CandleStore] = None
+_candle_store_checked = False
+
+
+def _get_candle_store() -> Optional[candle_store.CandleStore]:
+    """The archive beside the DB, or None when it is disabled/unavailable."""
+    global _candle_store, _candle_store_checked
+    if not _candle_store_checked:
+        _candle_store_checked = True
+        if CANDLE_ARCHIVE_KEEP > 0:
+            if candle_store.AVAILABLE:
+                _candle_store = candle_store.CandleStore(
+                    Path(DB_PATH_STR).with_suffix(".candles")
+                )
+            else:
+                logger.warning(
+                    "CANDLE_ARCHIVE_KEEP is set but pyarrow is not installed; "
+                    "all candles stay in SQLite"
+                )
+    return _candle_store
+
+
+def archive_candles(keep: Optional[int] = None) -> int:
+    """Move all but the newest *keep* candles per series to the archive.
+
+    *keep* defaults to ``CANDLE_ARCHIVE_KEEP``.  The rows are on disk in the
+    archive before they are deleted from SQLite.  Returns how many moved;
+    0 when the archive is disabled.
+    """
+    store = _get_candle_store()
+    if store is None:
+        return 0
+    keep = CANDLE_ARCHIVE_KEEP if keep is None else keep
+    with _candle_lock:
+        flush_writes(_MARKET)
+        with _txn(_MARKET) as conn:
+            rows = conn.execute(_SQL_SELECT_CANDLES_TO_ARCHIVE, (keep,)).fetchall()
+            if not rows:
+                return 0
+            store.append(rows)
+            conn.executemany(_SQL_DELETE_CANDLE, [r[:3] for r in rows])
+    logger.info("Archived %d candles (keeping %d per series)", len(rows), keep)
+    return len(rows)
+
+
 def get_candle_count(symbol: str, timeframe: str = "1m") -> int:
-    conn = _get_conn()
-    row = conn.execute(
-        "SELECT COUNT(*) FROM candles WHERE symbol = ? AND timeframe = ?",
-        (symbol, timeframe),
-    ).fetchone()
+    flush_writes(_MARKET)
+    with _reader() as cur:
+        row = cur.execute(
+            "SELECT n FROM candle_counts WHERE symbol = ? AND timeframe = ?",
+            (symbol, timeframe),
+        ).fetchone()
     return row[0] if row else 0
 
 
@@ -732,19 +2009,46 @@ def get_candle_count(symbol: str, timeframe: str = "1m") -> int:
 # ===========================================================================
 
 
+_SQL_RESET_SCRIPT = """
+    BEGIN IMMEDIATE;
+    DELETE FROM positions;
+    DELETE FROM orders;
+    DELETE FROM trades;
+    DELETE FROM pnl_history;
+    DELETE FROM pnl_1m;
+    DELETE FROM strategy_logs;
+    DELETE FROM candles;
+    DELETE FROM candle_counts;
+    DELETE FROM accounts;
+    COMMIT;
+"""
+
+
 def reset_db() -> None:
     """Drop all rows â€” useful for tests and fresh demos."""
-    with _lock:
-        conn = _get_conn()
-        for table in (
-            "positions",
-            "orders",
-            "trades",
-            "pnl_history",
-            "strategy_logs",
-            "candles",
-            "accounts",
-        ):
-            conn.execute(f"DELETE FROM {table}")
-        conn.commit()
-        logger.warning("Database reset: all rows deleted.")
+    global _candle_gen
+    conn = _get_conn()
+    with ExitStack() as stack:
+        stack.enter_context(_candle_lock)
+        _candle_gen += 1
+        _candle_accum.clear()
+        _candle_buffers.clear()
+        _candle_complete.clear()
+        # Every shard's tables are cleared, so hold every shard's lock
+        for sh in _shards.values():
+            stack.enter_context(sh.lock)
+            # Queued rows would be deleted straight away; skip writing them
+            sh.pending.clear()
+        try:
+            conn.executescript(_SQL_RESET_SCRIPT)
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        # Hand the WAL's pages back now rather than at the next checkpoint
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        store = _get_candle_store()
+        if store is not None:
+            store.clear()
+    _clear_read_caches()
+    logger.warning("Database reset: all rows deleted.")
@@ -34,35 +34,58 @@ class EngineState(enum.Enum):
     PAUSED = "PAUSED"
 
 
+# Pre-bound members for the per-tick predicates (one global load, no
+# attribute lookup on the enum class)
+_RUNNING = EngineState.RUNNING
+_STOPPED = EngineState.STOPPED
+# States each transition may start from; tuple ``in`` tests identity first
+_STARTABLE = (EngineState.IDLE, _STOPPED, EngineState.PAUSED)
+_STOPPABLE = (_RUNNING, EngineState.PAUSED)
+
+
 class EngineController:
     """Thread-safe centralised state machine for the trading engine."""
 
     def __init__(self, persist_fn=None, restore_fn=None) -> None:
         self._lock = threading.Lock()
-        self._stop_event = threading.Event()  # signalled when STOPPED
+        self._stop_event = threading.Event()  # set exactly while STOPPED
         self._reason: Optional[str] = None
         self._persist_fn = persist_fn  # callable(state_str) -> None
         self._restore_fn = restore_fn  # callable() -> str | None
+        # [is_running] -- flipped by every transition; see running_flag
+        self._running_flag = [False]
 
         # Restore state from DB if available
-        self._state = EngineState.IDLE
+        self._set_state(EngineState.IDLE)
         if restore_fn:
             try:
                 saved = restore_fn()
                 if saved and saved in ("RUNNING", "PAUSED"):
                     # Auto-resume to RUNNING if server was RUNNING before crash
-                    self._state = EngineState.RUNNING
+                    self._set_state(EngineState.RUNNING)
                     self._reason = "auto_resume"
                     logger.info(
                         "EngineController: auto-resumed from saved state %s", saved
                     )
                 elif saved == "STOPPED":
-                    self._state = EngineState.STOPPED
-                    self._stop_event.set()
+                    self._set_state(EngineState.STOPPED)
                     logger.info("EngineController: restored STOPPED state from DB")
             except Exception as exc:
                 logger.warning("EngineController: failed to restore state: %s", exc)
 
+    def _set_state(self, state: EngineState) -> None:
+        """Assign the state and keep running_flag and stop_event in step.
+
+        Caller holds _lock.  This is the only writer of all three, so
+        ``stop_event.is_set() == is_stopped`` holds after every transition.
+        """
+        self._state = state
+        self._running_flag[0] = state is _RUNNING
+        if state is _STOPPED:
+            self._stop_event.set()
+        else:
+            self._stop_event.clear()
+
     def _persist(self) -> None:
         """Persist current state to DB (if callback set)."""
         if self._persist_fn:
@@ -72,30 +95,45 @@ class EngineController:
                 logger.warning("EngineController: failed to persist state: %s", exc)
 
     # ── State queries ────────────────────────────────────────
+    # Lock-free: each reads one attribute, and a Python attribute load or
+    # store is atomic under the GIL, so a reader sees either the old state
+    # or the new one.  Transitions still hold _lock so state, reason and
+    # stop_event change together; to_dict() takes it for the same reason.
+    # Polling code should use these (is_stopped included) rather than
+    # stop_event.is_set(): a property read is cheaper than the Event call.
 
     @property
     def state(self) -> EngineState:
-        with self._lock:
-            return self._state
+        return self._state
 
     @property
     def is_running(self) -> bool:
-        with self._lock:
-            return self._state == EngineState.RUNNING
+        return self._state is _RUNNING
 
     @property
     def is_stopped(self) -> bool:
-        with self._lock:
-            return self._state == EngineState.STOPPED
+        return self._state is _STOPPED
 
     @property
     def stop_reason(self) -> Optional[str]:
-        with self._lock:
-            return self._reason
+        return self._reason
+
+    @property
+    def running_flag(self) -> list[bool]:
+        """One-element list whose item mirrors ``is_running``.
+
+        For the hottest guards: cache ``flag = controller.running_flag``
+        once and test ``flag[0]`` per tick.  The list object never changes,
+        only its item does, so a cached reference stays current.
+        """
+        return self._running_flag
 
     @property
     def stop_event(self) -> threading.Event:
-        """Threads can wait on this to know when the engine is stopped."""
+        """Threads can ``wait()`` on this to block until the engine stops.
+
+        To just check, read ``is_stopped``; the two always agree.
+        """
         return self._stop_event
 
     # ── Transitions ──────────────────────────────────────────
@@ -103,14 +141,9 @@ class EngineController:
     def start(self, reason: Optional[str] = None) -> bool:
         """Transition to RUNNING.  Returns True on success."""
         with self._lock:
-            if self._state in (
-                EngineState.IDLE,
-                EngineState.STOPPED,
-                EngineState.PAUSED,
-            ):
-                self._state = EngineState.RUNNING
+            if self._state in _STARTABLE:
+                self._set_state(_RUNNING)
                 self._reason = reason
-                self._stop_event.clear()
                 logger.info("EngineController -> RUNNING  (%s)", reason or "user")
                 self._persist()
                 return True
@@ -118,17 +151,16 @@ class EngineController:
             return False
 
     def stop(self, reason: Optional[str] = None) -> bool:
-        """Transition to STOPPED.  Signals the stop_event."""
+        """Transition to STOPPED (which sets stop_event)."""
         with self._lock:
-            if self._state in (EngineState.RUNNING, EngineState.PAUSED):
-                self._state = EngineState.STOPPED
+            if self._state in _STOPPABLE:
+                self._set_state(_STOPPED)
                 self._reason = reason or "user_stop"
-                self._stop_event.set()
                 logger.info("EngineController -> STOPPED  (%s)", self._reason)
                 self._persist()
                 return True
             # Already stopped / idle — idempotent
-            if self._state == EngineState.STOPPED:
+            if self._state is _STOPPED:
                 return True
             logger.warning("Cannot stop: current state is %s", self._state.value)
             return False
@@ -136,8 +168,8 @@ class EngineController:
     def pause(self, reason: Optional[str] = None) -> bool:
         """Transition to PAUSED (soft pause — can resume)."""
         with self._lock:
-            if self._state == EngineState.RUNNING:
-                self._state = EngineState.PAUSED
+            if self._state is _RUNNING:
+                self._set_state(EngineState.PAUSED)
                 self._reason = reason or "user_pause"
                 logger.info("EngineController -> PAUSED  (%s)", self._reason)
                 self._persist()
@@ -147,18 +179,16 @@ class EngineController:
     def reset(self) -> None:
         """Force back to IDLE (e.g. full system reset)."""
         with self._lock:
-            self._state = EngineState.IDLE
+            self._set_state(EngineState.IDLE)
             self._reason = None
-            self._stop_event.clear()
             logger.info("EngineController -> IDLE (reset)")
             self._persist()
 
     def emergency_stop(self, reason: str) -> None:
         """Unconditional hard stop from any state."""
         with self._lock:
-            self._state = EngineState.STOPPED
+            self._set_state(EngineState.STOPPED)
             self._reason = reason
-            self._stop_event.set()
             self._persist()
         logger.warning("EMERGENCY STOP: %s", reason)
 
@@ -168,6 +198,6 @@ class EngineController:
         with self._lock:
             return {
                 "state": self._state.value,
-                "running": self._state == EngineState.RUNNING,
+                "running": self._state is _RUNNING,
                 "reason": self._reason,
             }
@@ -31,12 +31,14 @@ import eventlet
 eventlet.monkey_patch()
 
 import argparse
+import atexit
 import logging
 import logging.handlers
 import os
+import queue
 import sys
-import threading
 import time as _time_mod
+from collections import deque
 from pathlib import Path
 
 # --- Ensure project root is on sys.path so ``app.*`` imports work ---
@@ -70,6 +72,7 @@ from app.config import (
     MODE,
     PNL_SNAPSHOT_INTERVAL,
 )
+from app.ws import json_codec
 
 # ---------------------------------------------------------------------------
 # Logging setup
@@ -77,19 +80,34 @@ from app.config import (
 
 
 def _setup_logging() -> None:
-    log_dir = Path(LOG_FILE).parent
-    log_dir.mkdir(parents=True, exist_ok=True)
+    # The log directory is created by app.config at import time
+    fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
     handlers = [
         logging.StreamHandler(sys.stdout),
         logging.handlers.RotatingFileHandler(
             LOG_FILE, maxBytes=5_000_000, backupCount=3
         ),
     ]
+    for handler in handlers:
+        handler.setFormatter(fmt)
+    # Callers only enqueue the record; the listener does the console and
+    # file writes (and rotation checks) off the tick loop.  queue.Queue
+    # rather than SimpleQueue: eventlet greens the former, and the C
+    # SimpleQueue.get() would block the whole hub from the listener.
+    log_queue: queue.Queue = queue.Queue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    # The queued record is formatted once more by each listener handler
+    enqueue = logging.handlers.QueueHandler(log_queue)
+    enqueue.setFormatter(logging.Formatter("%(message)s"))
     logging.basicConfig(
         level=getattr(logging, LOG_LEVEL.upper(), logging.INFO),
-        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        handlers=handlers,
+        handlers=[enqueue],
     )
+    listener.start()
+    # Drain whatever is still queued when the process exits
+    atexit.register(listener.stop)
 
 
 _setup_logging()
@@ -106,7 +124,10 @@ app = Flask(
 )
 app.config["SECRET_KEY"] = SECRET_KEY
 CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet")
+# Every emit is JSON-encoded through json_codec (orjson when installed)
+socketio = SocketIO(
+    app, cors_allowed_origins="*", async_mode="eventlet", json=json_codec
+)
 
 # ---------------------------------------------------------------------------
 # Shared mutable state (thread-safe via locks in respective modules)
@@ -118,7 +139,7 @@ current_prices: dict[str, float] = {}
 # Ring buffer of recent ticks per symbol — sent to clients on connect so
 # the chart shows historical candles immediately instead of starting empty.
 TICK_HISTORY_SIZE = 500  # keep last N ticks per symbol
-tick_history: dict[str, list] = {}  # {symbol: [tick_dict, ...]}
+tick_history: dict[str, deque] = {}  # {symbol: deque of tick dicts, bounded}
 
 # ---------------------------------------------------------------------------
 # Wire components
@@ -220,18 +241,26 @@ order_validator = OrderValidator(
 # The webhook approach fails because the broker's threading.Thread
 # issues HTTP POSTs back to the same server, which can deadlock
 # or silently fail under eventlet.
-def _broker_on_update(payload):
+# Order updates from the broker thread, emitted by _broker_event_pump().
+# One producer (the broker loop) and one consumer (the pump), so plain
+# deque append/popleft need no lock.
+_broker_events: deque[dict] = deque()
+_BROKER_PUMP_SEC = 0.05
+
+
+def _broker_on_update(msg):
     """Direct callback from SimulatedBroker — runs in broker thread.
 
-    IMPORTANT: We schedule the actual SocketIO emit onto the eventlet
-    hub via ``socketio.start_background_task`` so that the emit
-    reliably reaches connected clients (cross-thread emit under
-    eventlet can silently fail otherwise).
+    ``msg`` is a :class:`~app.broker.simulated_broker.UpdateMsg`.
+
+    IMPORTANT: the SocketIO emits happen on the eventlet hub, in
+    ``_broker_event_pump`` (cross-thread emit under eventlet can silently
+    fail otherwise); this only applies the update and queues the payload.
     """
-    order_id = payload.get("order_id")
-    new_status = payload.get("status", "")
-    filled_qty = int(payload.get("filled_qty", 0))
-    avg_price = float(payload.get("avg_price", 0.0))
+    order_id = msg.order_id
+    new_status = msg.status
+    filled_qty = msg.filled_qty
+    avg_price = msg.avg_price
 
     mgr = _broker_on_update._order_mgr
     if mgr is None:
@@ -243,7 +272,7 @@ def _broker_on_update(payload):
     if updated is None:
         return
 
-    # Build the payload once, then emit from the eventlet hub
+    # Build the payload once; the pump emits it from the eventlet hub
     ts_now = engine_clock.now_iso()
     order_data = {
         "order_id": updated["order_id"],
@@ -262,13 +291,32 @@ def _broker_on_update(payload):
         "updated_at": updated["updated_at"],
         "timestamp": ts_now,
     }
+    _broker_events.append(order_data)
+
 
-    def _do_emit():
-        """Runs on the eventlet hub — safe to call socketio.emit here."""
-        socketio.emit("order_update", order_data)
-        logger.debug("Order update emitted: %s → %s", order_id[:8], new_status)
+def _broker_event_pump() -> None:
+    """Background task: emit queued broker updates from the eventlet hub.
 
-        # Also broadcast position + PnL updates
+    Every queued ``order_update`` goes out in order, followed by ONE
+    position and PnL update for the whole burst, so K fills landing
+    together cost one recompute instead of K.
+    """
+    events = _broker_events
+    while not _tick_state["stop"]:
+        socketio.sleep(_BROKER_PUMP_SEC)
+        if not events:
+            continue
+        mgr = _broker_on_update._order_mgr
+        while events:
+            order_data = events.popleft()
+            socketio.emit("order_update", order_data)
+            logger.debug(
+                "Order update emitted: %s → %s",
+                order_data["order_id"][:8],
+                order_data["status"],
+            )
+        # Also broadcast position + PnL updates, stamped like the last order
+        ts_now = order_data["timestamp"]
         positions = mgr.get_positions()
         socketio.emit("position_update", {"positions": positions, "timestamp": ts_now})
         try:
@@ -278,8 +326,6 @@ def _broker_on_update(payload):
         except Exception:
             pass
 
-    socketio.start_background_task(_do_emit)
-
 
 _broker_on_update._order_mgr = None  # set after order_mgr is created
 
@@ -360,7 +406,13 @@ def favicon():
 # Tick streaming background thread
 # ---------------------------------------------------------------------------
 
-_tick_thread_stop = threading.Event()
+# Set ``_tick_state["stop"] = True`` to end the tick loop and broker pump.
+# A plain dict read, not a threading.Event: both loops are greenlets on
+# the one eventlet hub, and Event.is_set() takes its condition's lock.
+_tick_state = {"stop": False}
+
+# Unchanged PnL/positions are re-sent at most this often (keep-alive)
+PNL_HEARTBEAT_SEC = 5.0
 
 
 def _tick_loop(symbols: list[str]) -> None:
@@ -383,80 +435,145 @@ def _tick_loop(symbols: list[str]) -> None:
         return
 
     data_feed.connect()
-    generators = data_feed.create_generators()
-
-    logger.info("Tick loop started for %s", list(generators.keys()))
+    # One generator walks every symbol's bars from a shared numpy buffer
+    # and hands back one bar's ticks per cycle.  Ticks are stamped below,
+    # once per cycle, so skip the per-tick stamp.
+    tick_gen = data_feed.create_batched_generator(stamp=False)
+
+    logger.info("Tick loop started for %s", symbols)
+    dispatch_tick = data_feed.dispatch
+    # Live view of controller.is_running; one index per symbol, no call
+    running_flag = controller.running_flag
+    # Bound once: the loop body calls each of these every cycle or symbol
+    validator_tick = order_validator.tick
+    clock_now = engine_clock.now_utc
+    now_iso = engine_clock.now_iso
+    market_open = engine_clock.is_market_open
+    agg_on_tick = candle_aggregator.on_tick
+    strategy_on_tick = engine.on_tick
+    check_sl_tp = order_mgr.check_sl_tp
+    get_pnl = order_mgr.get_pnl
+    get_positions = order_mgr.get_positions
+    upsert_candles = storage.upsert_candles_bulk
+    upsert_candle_rows = storage.upsert_candle_rows
+    insert_snapshot = storage.insert_pnl_snapshot
+    emit = socketio.emit
+    preencode = json_codec.preencode
+    sleep = socketio.sleep
+    monotonic = _time_mod.monotonic
+    # Last broadcast PnL values / positions, to skip identical frames
+    last_pnl_state: tuple = ()
+    last_positions: dict = {}
+    last_pnl_emit = 0.0
+    # Candles produced during one cycle, merged in one pass at its end:
+    # completed aggregator candles (dicts) and raw "tick" candles, built
+    # as rows in storage.Candle field order so storage skips the parse
+    candle_batch: list[dict] = []
+    tick_rows: list[tuple] = []
     _pnl_counter = 0
     _cleanup_counter = 0
     _snapshot_counter = 0
 
-    while not _tick_thread_stop.is_set() and not data_feed.should_stop:
+    while not _tick_state["stop"] and not data_feed.should_stop:
 
         # ── Advance validator tick counter (always) ──
-        order_validator.tick()
+        validator_tick()
 
         # ── Get authoritative timestamp for this tick cycle ──
-        cycle_ts = engine_clock.now_iso()
-        cycle_epoch = engine_clock.epoch()
+        # One clock read per cycle; the ISO string is shared by every tick
+        cycle_now = clock_now()
+        cycle_ts = cycle_now.isoformat()
+        cycle_ms = int(cycle_now.timestamp() * 1000)
+        cycle_epoch = cycle_ms // 1000
+        # This cycle's ticks, sent to clients as one "ticks_batch" event
+        cycle_ticks: list[dict] = []
+        # Invariant for the cycle; engine.on_tick() re-checks the running
+        # flag itself, so a stop mid-cycle still takes effect at once
+        strategies_on = running_flag[0] and market_open()
 
         # ── Emit ticks for EVERY symbol (market data always streams) ──
-        for yf_sym, gen in generators.items():
-            try:
-                tick = next(gen)
-            except StopIteration:
-                continue
+        for tick in next(tick_gen, ()):
+            yf_sym = tick["symbol"]
 
-            # Stamp tick with authoritative UTC timestamp
+            # Stamp tick with authoritative UTC timestamp (ISO + epoch ms)
             tick["timestamp"] = cycle_ts
+            tick["ts_ms"] = cycle_ms
+
+            # Every field the candles need, read from the tick once
+            price = tick["price"]
+            volume = tick.get("volume", 0)
 
             # Update shared price map (always — needed for chart)
-            current_prices[yf_sym] = tick["price"]
+            current_prices[yf_sym] = price
 
             # Ring buffer for reconnecting clients (always)
-            buf = tick_history.setdefault(yf_sym, [])
-            buf.append(tick)
-            if len(buf) > TICK_HISTORY_SIZE:
-                tick_history[yf_sym] = buf[-TICK_HISTORY_SIZE:]
+            buf = tick_history.get(yf_sym)
+            if buf is None:
+                buf = tick_history[yf_sym] = deque(maxlen=TICK_HISTORY_SIZE)
+            buf.append(tick)  # the deque drops the oldest tick itself
 
             # ── Candle aggregation (timeframe-aligned) ──
             try:
-                completed = candle_aggregator.on_tick(
-                    yf_sym, tick["price"], tick.get("volume", 0), cycle_epoch
-                )
+                completed = agg_on_tick(yf_sym, price, volume, cycle_epoch)
                 if completed:
-                    storage.upsert_candle(completed)
+                    candle_batch.append(completed)
 
                 # Also persist a raw "tick" candle for chart compatibility
-                raw_candle = {
-                    "symbol": yf_sym,
-                    "timeframe": "tick",
-                    "timestamp": cycle_epoch,
-                    "open": tick.get("open", tick["price"]),
-                    "high": tick.get("high", tick["price"]),
-                    "low": tick.get("low", tick["price"]),
-                    "close": tick["price"],
-                    "volume": tick.get("volume", 0),
-                }
-                storage.insert_or_update_candle(raw_candle)
+                tick_rows.append(
+                    (
+                        yf_sym,
+                        "tick",
+                        cycle_epoch,
+                        float(tick.get("open", price)),
+                        float(tick.get("high", price)),
+                        float(tick.get("low", price)),
+                        float(price),
+                        float(volume),
+                    )
+                )
             except Exception as exc:
-                logger.debug("Candle persistence error: %s", exc)
+                logger.debug("Candle aggregation error: %s", exc)
 
-            # Emit tick to all clients (always — chart updates regardless)
-            socketio.emit("tick", tick)
+            # Queue tick for clients (always — chart updates regardless)
+            cycle_ticks.append(tick)
+
+            # In-process subscribers registered via data_feed.on_tick()
+            try:
+                dispatch_tick(tick)
+            except Exception as exc:
+                logger.error("Tick callback error: %s", exc)
 
             # ── STRATEGY: only when RUNNING and market is open ──
-            if controller.is_running and engine_clock.is_market_open():
-                signal = engine.on_tick(tick)
+            if strategies_on:
+                signal = strategy_on_tick(tick)
                 if signal:
                     signal["timestamp"] = cycle_ts
-                    socketio.emit("signal", signal)
+                    emit("signal", signal)
+
+        # ── One frame for every symbol's tick, then yield so it goes out ──
+        if cycle_ticks:
+            # Encoded once here; the emit only splices the bytes in
+            emit(
+                "ticks_batch",
+                preencode({"ts": cycle_ts, "items": cycle_ticks}),
+            )
+            sleep(0)
 
-            socketio.sleep(0.02)
+        # ── Persist this cycle's candles: one commit for all symbols ──
+        if candle_batch or tick_rows:
+            try:
+                if candle_batch:
+                    upsert_candles(candle_batch)
+                upsert_candle_rows(tick_rows)
+            except Exception as exc:
+                logger.debug("Candle persistence error: %s", exc)
+            candle_batch.clear()
+            tick_rows.clear()
 
         # ── SL/TP enforcement: ALWAYS run (protects positions even when STOPPED) ──
-        sl_tp_orders = order_mgr.check_sl_tp(current_prices)
+        sl_tp_orders = check_sl_tp(current_prices)
         for o in sl_tp_orders:
-            socketio.emit(
+            emit(
                 "signal",
                 {
                     "action": o["side"],
@@ -464,7 +581,7 @@ def _tick_loop(symbols: list[str]) -> None:
                     "price": o["price"],
                     "reason": f"Auto {o['strategy']} exit",
                     "strategy": o["strategy"],
-                    "timestamp": engine_clock.now_iso(),
+                    "timestamp": cycle_ts,
                 },
             )
 
@@ -473,18 +590,31 @@ def _tick_loop(symbols: list[str]) -> None:
         # of engine state.  Open positions change value as prices move;
         # every real trading terminal shows this.  Stopping the engine
         # only halts NEW signal generation, not portfolio tracking.
+        # Frames identical to the last ones are skipped (a quiet market
+        # or a flat book) apart from a heartbeat every PNL_HEARTBEAT_SEC.
         _pnl_counter += 1
         if _pnl_counter % 2 == 0:
-            pnl_ts = engine_clock.now_iso()
-            pnl_data = order_mgr.get_pnl(current_prices=current_prices)
+            pnl_data = get_pnl(current_prices=current_prices)
             pnl_data["engine_running"] = controller.is_running
-            pnl_data["timestamp"] = pnl_ts
-            socketio.emit("pnl_update", pnl_data)
-            positions = order_mgr.get_positions()
-            socketio.emit(
-                "position_update", {"positions": positions, "timestamp": pnl_ts}
-            )
-            socketio.sleep(0)  # yield so eventlet flushes the frames
+            pnl_state = tuple(pnl_data.values())
+            positions = get_positions()
+            now_mono = monotonic()
+            if (
+                pnl_state != last_pnl_state
+                or positions != last_positions
+                or now_mono - last_pnl_emit >= PNL_HEARTBEAT_SEC
+            ):
+                pnl_ts = now_iso()
+                pnl_data["timestamp"] = pnl_ts
+                emit("pnl_update", pnl_data)
+                emit(
+                    "position_update",
+                    {"positions": positions, "timestamp": pnl_ts},
+                )
+                sleep(0)  # yield so eventlet flushes the frames
+                last_pnl_state = pnl_state
+                last_positions = positions
+                last_pnl_emit = now_mono
 
         # ── Periodic cleanup (always) ──
         _cleanup_counter += 1
@@ -497,13 +627,13 @@ def _tick_loop(symbols: list[str]) -> None:
         _snapshot_counter += 1
         if _snapshot_counter % PNL_SNAPSHOT_INTERVAL == 0:
             try:
-                snap = order_mgr.get_pnl(current_prices=current_prices)
-                snap["timestamp"] = engine_clock.now_iso()
-                storage.insert_pnl_snapshot(snap)
+                snap = get_pnl(current_prices=current_prices)
+                snap["timestamp"] = now_iso()
+                insert_snapshot(snap)
             except Exception as exc:
                 logger.debug("PnL snapshot error: %s", exc)
 
-        socketio.sleep(max(0.05, TICK_INTERVAL_SEC - 0.06))
+        sleep(max(0.05, TICK_INTERVAL_SEC - 0.06))
 
     data_feed.disconnect()
     logger.info("Tick loop stopped")
@@ -539,6 +669,7 @@ def main():
         )
 
     broker.start()
+    socketio.start_background_task(_broker_event_pump)
     socketio.start_background_task(_tick_loop, DEFAULT_SYMBOLS)
 
     logger.info("Starting server on %s:%d  ML=%s", args.host, args.port, use_ml)
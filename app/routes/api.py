@@ -77,7 +77,8 @@ def get_candles():
         limit = 500
     limit = min(max(limit, 1), 5000)  # clamp 1-5000
 
-    candles = storage.get_recent_candles(symbol, timeframe, limit)
+    rows = storage.get_recent_candles(symbol, timeframe, limit)
+    candles = [storage.as_dict(c) for c in rows]
     return jsonify({"candles": candles, "count": len(candles)}), 200
 
 
@@ -211,6 +212,7 @@ def get_equity_history():
 
     Query params:
         - limit: max number of records (default 500)
+        - resolution: "raw" (every snapshot, default) or "1m" (one per minute)
 
     Returns list of snapshots with timestamp, capital, realised_pnl, unrealised_pnl, total_pnl.
     """
@@ -218,7 +220,10 @@ def get_equity_history():
 
     limit = request.args.get("limit", 500, type=int)
     limit = min(max(1, limit), 5000)  # clamp to reasonable range
-    snapshots = storage.get_pnl_history(limit=limit)
+    resolution = request.args.get("resolution", "raw")
+    if resolution not in ("raw", "1m"):
+        return jsonify({"error": "resolution must be 'raw' or '1m'"}), 400
+    snapshots = storage.get_pnl_history(limit=limit, resolution=resolution)
     # Reverse to chronological order (oldest first) for charting
     snapshots.reverse()
     return jsonify({"equity_history": snapshots, "count": len(snapshots)}), 200
@@ -353,7 +358,7 @@ def get_trades():
     except (ValueError, TypeError):
         limit = 100
 
-    trades = storage.get_trades(limit=limit)
+    trades = [storage.as_dict(t) for t in storage.get_trades(limit=limit)]
     return jsonify({"trades": trades}), 200
 
 
@@ -60,6 +60,8 @@ class StrategyEngine:
         self._tick_count = 0
         self._capital_mgr = capital_mgr
         self._controller = controller  # EngineController (single source of truth)
+        # Cached once; flag[0] is the per-tick "is the controller RUNNING?"
+        self._running_flag = controller.running_flag if controller else None
         self._halted_reason: Optional[str] = None
 
         # Respect kill switch from config on init
@@ -180,7 +182,8 @@ class StrategyEngine:
         **Immediately returns None if the controller is not RUNNING.**
         """
         # ── Gate: only process when controller is RUNNING ──
-        if self._controller and not self._controller.is_running:
+        flag = self._running_flag
+        if flag is not None and not flag[0]:
             return None
         if self._strategy is None:
             return None
@@ -19,13 +19,15 @@ yfinance limits
 * Yahoo Finance API can be unreliable/blocked — synthetic fallback is provided.
 """
 
+import functools
 import logging
 import math
 import random
+import sys
 import time
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Generator, Optional
+from typing import Generator, NamedTuple, Optional, Sequence
 
 import numpy as np
 import pandas as pd
@@ -33,14 +35,19 @@ import pandas as pd
 from app.config import DATA_DIR, DEFAULT_SYMBOLS, TICK_INTERVAL_SEC
 
 
+try:
+    from app.utils.clock import EngineClock
+
+    _CLOCK: Optional[EngineClock] = EngineClock(mode="demo")
+except Exception:
+    _CLOCK = None
+
+
 def _utc_now_iso() -> str:
     """Return current UTC time as ISO 8601 string via EngineClock."""
-    try:
-        from app.utils.clock import EngineClock
-
-        return EngineClock(mode="demo").now_iso()
-    except Exception:
-        return datetime.now(timezone.utc).isoformat()
+    if _CLOCK is not None:
+        return _CLOCK.now_iso()
+    return datetime.now(timezone.utc).isoformat()
 
 
 logger = logging.getLogger(__name__)
@@ -70,6 +77,9 @@ SYMBOL_MAP: dict[str, str] = {
     "LT": "LT.NS",
 }
 
+# Yahoo exchange suffixes (NSE, BSE)
+_EXCHANGE_SUFFIXES: tuple[str, ...] = (".NS", ".BO")
+
 # Realistic base prices for Indian large-caps (used by synthetic generator)
 _SYNTHETIC_BASE_PRICES: dict[str, float] = {
     "RELIANCE.NS": 2540.0,
@@ -85,13 +95,19 @@ _SYNTHETIC_BASE_PRICES: dict[str, float] = {
 }
 
 
+@functools.lru_cache(maxsize=512)
 def resolve_symbol(symbol: str) -> str:
-    """Return Yahoo-compatible ticker.  Append .NS if suffix missing."""
+    """Return Yahoo-compatible ticker.  Append .NS if suffix missing.
+
+    The result is interned, so every tick, position and feed key for a
+    symbol shares one string object.
+    """
     if symbol in SYMBOL_MAP:
-        return SYMBOL_MAP[symbol]
-    if not (symbol.endswith(".NS") or symbol.endswith(".BO")):
-        return f"{symbol}.NS"
-    return symbol
+        return sys.intern(SYMBOL_MAP[symbol])
+    # Plain suffix test rather than a regex: one C-level call, no match object
+    if not symbol.endswith(_EXCHANGE_SUFFIXES):
+        return sys.intern(f"{symbol}.NS")
+    return sys.intern(symbol)
 
 
 # ---------------------------------------------------------------------------
@@ -171,6 +187,7 @@ def generate_synthetic_ohlcv(
         DATA_DIR.mkdir(parents=True, exist_ok=True)
         path = DATA_DIR / f"{yf_symbol.replace('.', '_')}_1d.csv"
         df.to_csv(path)
+        _read_cached_ohlcv.cache_clear()
         logger.info("Generated %d rows of synthetic data → %s", len(df), path)
 
     return df
@@ -228,6 +245,7 @@ def download_ohlcv(
             DATA_DIR.mkdir(parents=True, exist_ok=True)
             path = DATA_DIR / f"{yf_symbol.replace('.', '_')}_{interval}.csv"
             df.to_csv(path)
+            _read_cached_ohlcv.cache_clear()
             logger.info("Saved %d rows → %s", len(df), path)
         return df
 
@@ -240,16 +258,30 @@ def download_ohlcv(
     return generate_synthetic_ohlcv(yf_symbol, days=500, save=save)
 
 
-def load_cached_ohlcv(symbol: str, interval: str = "1d") -> pd.DataFrame:
-    """Load previously downloaded CSV.  Returns empty DataFrame on miss."""
+def cached_ohlcv_path(symbol: str, interval: str = "1d") -> Path:
+    """Return the CSV path ``load_cached_ohlcv`` reads for ``symbol``."""
     yf_symbol = resolve_symbol(symbol)
-    path = DATA_DIR / f"{yf_symbol.replace('.', '_')}_{interval}.csv"
+    return DATA_DIR / f"{yf_symbol.replace('.', '_')}_{interval}.csv"
+
+
+@functools.lru_cache(maxsize=64)
+def _read_cached_ohlcv(yf_symbol: str, interval: str) -> pd.DataFrame:
+    path = cached_ohlcv_path(yf_symbol, interval)
     if path.exists():
-        df = pd.read_csv(path, index_col="Date", parse_dates=True)
-        return df
+        return pd.read_csv(path, index_col="Date", parse_dates=True)
     return pd.DataFrame()
 
 
+def load_cached_ohlcv(symbol: str, interval: str = "1d") -> pd.DataFrame:
+    """Load previously downloaded CSV.  Returns empty DataFrame on miss.
+
+    The parsed frame is memoized per ``(symbol, interval)`` and invalidated
+    whenever this module writes a new CSV.  Callers get a shallow copy, so
+    adding columns never leaks into the cache.
+    """
+    return _read_cached_ohlcv(resolve_symbol(symbol), interval).copy(deep=False)
+
+
 # ---------------------------------------------------------------------------
 # Tick simulator
 # ---------------------------------------------------------------------------
@@ -259,6 +291,7 @@ def tick_generator(
     symbol: str,
     interval_sec: float = TICK_INTERVAL_SEC,
     loop: bool = True,
+    stamp: bool = True,
 ) -> Generator[dict, None, None]:
     """
     Yield simulated ticks by replaying daily close prices.
@@ -270,6 +303,8 @@ def tick_generator(
 
     The generator sleeps ``interval_sec`` between ticks.
     When ``loop=True`` (default) it wraps around to the beginning of the dataset.
+    With ``stamp=False`` ticks carry no ``"timestamp"``; the consumer sets
+    it (the engine tick loop stamps a whole cycle with one value).
     """
     df = load_cached_ohlcv(symbol)
     if df.empty:
@@ -291,8 +326,9 @@ def tick_generator(
             "close": float(row["Close"]),
             "price": float(row["Close"]),
             "volume": int(row.get("Volume", 0)),
-            "timestamp": _utc_now_iso(),
         }
+        if stamp:
+            tick["timestamp"] = _utc_now_iso()
         yield tick
         time.sleep(interval_sec)
         idx += 1
@@ -303,6 +339,125 @@ def tick_generator(
                 return
 
 
+def _ohlcv_columns(df: pd.DataFrame) -> tuple[np.ndarray, ...]:
+    """Return ``(open, high, low, close, volume)`` float64 columns of ``df``."""
+    close = df["Close"].to_numpy(dtype=np.float64)
+    cols = [
+        df[name].to_numpy(dtype=np.float64) if name in df else close
+        for name in ("Open", "High", "Low")
+    ]
+    volume = (
+        df["Volume"].to_numpy(dtype=np.float64)
+        if "Volume" in df
+        else np.zeros_like(close)
+    )
+    return (*cols, close, volume)
+
+
+class TickBuffer(NamedTuple):
+    """OHLCV of many symbols as struct-of-arrays, each ``[n_bars, n_symbols]``.
+
+    ``lengths[j]`` is how many leading rows of column ``j`` hold real bars;
+    shorter histories are padded with NaN up to the longest one.
+    """
+
+    symbols: tuple[str, ...]
+    opens: np.ndarray
+    highs: np.ndarray
+    lows: np.ndarray
+    closes: np.ndarray
+    volumes: np.ndarray
+    lengths: np.ndarray
+
+
+def load_tick_buffer(symbols: Sequence[str]) -> TickBuffer:
+    """
+    Stack every symbol's bars column-wise into one :class:`TickBuffer`.
+
+    Each symbol keeps its full history.  Symbols with no data at all are
+    logged and left out, so ``buffer.symbols`` may be shorter than
+    ``symbols``.
+    """
+    resolved: list[str] = []
+    columns: list[tuple[np.ndarray, ...]] = []
+    for symbol in symbols:
+        df = load_cached_ohlcv(symbol)
+        if df.empty:
+            logger.info("No cached data for %s; fetching (with fallback) …", symbol)
+            df = download_ohlcv(symbol)
+        if df.empty:
+            logger.error("Cannot generate ticks — no data for %s", symbol)
+            continue
+        resolved.append(resolve_symbol(symbol))
+        columns.append(_ohlcv_columns(df))
+
+    lengths = np.array([len(cols[3]) for cols in columns], dtype=np.intp)
+    n_bars = int(lengths.max()) if len(lengths) else 0
+    arrays = []
+    for k in range(5):
+        arr = np.full((n_bars, len(columns)), np.nan)
+        for j, cols in enumerate(columns):
+            arr[: lengths[j], j] = cols[k]
+        arrays.append(arr)
+    return TickBuffer(tuple(resolved), *arrays, lengths)
+
+
+def batched_tick_generator(
+    buffer: TickBuffer,
+    interval_sec: float = TICK_INTERVAL_SEC,
+    loop: bool = True,
+    stamp: bool = True,
+) -> Generator[list[dict], None, None]:
+    """
+    Yield one list of simulated ticks per bar from a shared price buffer.
+
+    Every symbol replays its own history, exactly as ``tick_generator``
+    would: with ``loop`` each one wraps around at its own length,
+    otherwise it drops out of the lists once its bars run out.  Ticks are
+    in ``buffer.symbols`` order; ``interval_sec`` is slept after each
+    list and ``stamp`` is as for ``tick_generator``.
+    """
+    symbols = buffer.symbols
+    lengths = buffer.lengths
+    if not symbols:
+        return
+    n_steps = int(lengths.max())
+    cols = np.arange(len(symbols))
+
+    step = 0
+    while loop or step < n_steps:
+        # (row per symbol, symbol columns) of the bars this step replays
+        if loop:
+            idx = (step % lengths, cols)
+        else:
+            idx = (step, cols[step < lengths])
+        live = idx[1].tolist()
+        o_row = buffer.opens[idx].tolist()
+        h_row = buffer.highs[idx].tolist()
+        l_row = buffer.lows[idx].tolist()
+        c_row = buffer.closes[idx].tolist()
+        v_row = buffer.volumes[idx].tolist()
+        ticks = [
+            {
+                "symbol": symbols[j],
+                "open": o_row[k],
+                "high": h_row[k],
+                "low": l_row[k],
+                "close": c_row[k],
+                "price": c_row[k],
+                "volume": int(v_row[k]),
+            }
+            for k, j in enumerate(live)
+        ]
+        if stamp:
+            ts = _utc_now_iso()
+            for tick in ticks:
+                tick["timestamp"] = ts
+        yield ticks
+        step += 1
+        time.sleep(interval_sec)
+
+
 def fetch_default_symbols() -> None:
     """Download OHLCV for all default symbols (with automatic synthetic fallback)."""
     for sym in DEFAULT_SYMBOLS:
@@ -0,0 +1,53 @@
+"""
+app/ws/json_codec.py
+====================
+``json``-module stand-in for Flask-SocketIO, backed by orjson.
+
+Every ``socketio.emit`` encodes its payload through the server's json
+module; passing this module as ``SocketIO(app, json=json_codec)`` moves
+that encode into orjson's C implementation.  numpy scalars and arrays
+encode natively.  Without orjson (or for a type it rejects) the stdlib
+encoder is used, with ``str()`` as the fallback for unknown types.
+
+``preencode()`` serialises a payload ahead of the emit.  SocketIO then
+copies those bytes into each packet it builds instead of walking the
+payload again, which matters for the per-cycle ``ticks_batch``.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+
+    _OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    # orjson >= 3.9; older releases just encode the payload at emit time
+    _Fragment = getattr(orjson, "Fragment", None)
+
+    def dumps(obj: Any, **kwargs: Any) -> str:
+        # kwargs (e.g. separators) are ignored: orjson is always compact
+        try:
+            return orjson.dumps(obj, option=_OPTIONS).decode()
+        except TypeError:
+            kwargs.setdefault("default", str)
+            return json.dumps(obj, **kwargs)
+
+    def loads(s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def preencode(obj: Any) -> Any:
+        if _Fragment is None:
+            return obj
+        return _Fragment(orjson.dumps(obj, option=_OPTIONS))
+
+except ImportError:
+
+    def dumps(obj: Any, **kwargs: Any) -> str:
+        kwargs.setdefault("default", str)
+        return json.dumps(obj, **kwargs)
+
+    def loads(s: Any, **kwargs: Any) -> Any:
+        return json.loads(s, **kwargs)
+
+    def preencode(obj: Any) -> Any:
+        return obj
@@ -7,7 +7,7 @@ All control actions (start/stop/set_strategy) go through the EngineController
 so that engine state is always consistent.
 
 Events emitted by the server:
-    tick            — per-tick price data
+    ticks_batch     — every symbol's tick for one cycle (emitted by main)
     order_update    — order state changes
     position_update — position changes
     status          — engine state snapshot
@@ -47,7 +47,8 @@ def init_socketio(
     _engine = engine
     _order_mgr = order_mgr
     _current_prices = current_prices_ref
-    _tick_history = tick_history_ref or {}
+    # "is not None": main's dict is still empty (falsy) when this runs
+    _tick_history = tick_history_ref if tick_history_ref is not None else {}
     _controller = controller
     _clock = clock
 
@@ -109,7 +110,11 @@ def init_socketio(
 
         # Send accumulated tick history for chart
         if _tick_history:
-            emit("tick_history", _tick_history)
+            # Per-symbol deques; lists are what the JSON encoder accepts
+            emit(
+                "tick_history",
+                {sym: list(buf) for sym, buf in _tick_history.items()},
+            )
 
         positions = _order_mgr.get_positions()
         emit("position_update", {"positions": positions})
@@ -330,7 +330,8 @@ function flushCandle() {
 
     // Use the LAST tick's real timestamp for this candle
     const last = pendingTicks[pendingTicks.length - 1];
-    const chartTime = isoToChartTime(last.timestamp);
+    // ts_ms (epoch ms) skips parsing the ISO string on every candle
+    const chartTime = isoToChartTime(last.ts_ms ? last.ts_ms / 1000 : last.timestamp);
 
     // Aggregate pending ticks into one OHLCV candle
     const first = pendingTicks[0];
@@ -685,7 +686,7 @@ function connectSocket() {
     });
 
     // ── Tick ──
-    socket.on('tick', tick => {
+    function handleTick(tick) {
         tickCount++;
 
         // Watchlist update for all symbols
@@ -707,6 +708,12 @@ function connectSocket() {
             }
             stTicks.textContent = tickCount;
         }
+    }
+    socket.on('tick', handleTick);
+
+    // ── Ticks batch (one event per cycle, every symbol's tick) ──
+    socket.on('ticks_batch', batch => {
+        for (const tick of batch.items) handleTick(tick);
     });
 
     // ── Order Update (single order — real-time from broker callback) ──
@@ -372,3 +372,440 @@ class TestRSIStrategy:
                 signals.append(sig)
         buy_signals = [s for s in signals if s["action"] == "BUY"]
         assert len(buy_signals) > 0
+
+
+# ---------------------------------------------------------------------------
+# Storage write-behind queue tests
+# ---------------------------------------------------------------------------
+
+from app.db import storage
+
+
+class TestWriteBehind:
+    """Queued inserts must survive synchronous writes on the same shard."""
+
+    def _order(self):
+        return {
+            "order_id": str(uuid.uuid4()),
+            "symbol": "TEST.NS",
+            "side": "BUY",
+            "qty": 1,
+            "price": 100.0,
+        }
+
+    def _hold_writer(self):
+        # While held, the background writer can't commit the queue first
+        return storage._shards[storage._TRADING].lock
+
+    def test_sync_update_after_queued_insert(self):
+        order = self._order()
+        with self._hold_writer():
+            storage.insert_order(order)
+            storage.update_order(order["order_id"], {"status": "ACK"})
+        assert storage.get_order(order["order_id"])["status"] == "ACK"
+
+    def test_rollback_keeps_queued_writes(self):
+        order = self._order()
+        with self._hold_writer():
+            storage.insert_order(order)
+            with pytest.raises(KeyError):
+                storage.record_fill(
+                    {
+                        "account_id": _test_account_id(),
+                        "available_capital": 0.0,
+                        "realised_pnl": 0.0,
+                    },
+                    {"symbol": "TEST.NS", "side": "BUY", "qty": 0, "avg_price": 0.0},
+                    trade={},  # missing keys -> raises inside the transaction
+                )
+        assert storage.get_order(order["order_id"]) is not None
+
+    def test_bad_row_does_not_drop_batch(self):
+        first, second, third = self._order(), self._order(), self._order()
+        with self._hold_writer():
+            storage.insert_order(first)
+            storage.insert_order(dict(first))  # duplicate order_id
+            storage.insert_order(second)
+            storage.insert_order(third)
+            storage.flush_writes(storage._TRADING)
+        for order in (first, second, third):
+            assert storage.get_order(order["order_id"]) is not None
+
+
+# ---------------------------------------------------------------------------
+# Configuration tests
+# ---------------------------------------------------------------------------
+
+from app import config
+
+
+class TestResetSettings:
+    """reset_settings() must reach config lookups and call-time readers."""
+
+    def test_reset_applies_to_live_readers(self, monkeypatch):
+        before = config.ORDER_TIMEOUT_SEC
+        cm = CapitalManager(initial_capital=1_000_000, account_id=_test_account_id())
+        mgr = OrderManager(broker_submit_fn=lambda order: True, capital_mgr=cm)
+        order_id = mgr.place_manual_order("TIMEOUT.NS", "BUY", 1, 100.0)["order_id"]
+        mgr.cleanup_stale_orders()
+        assert order_id in {o["order_id"] for o in mgr.get_open_orders()}
+
+        monkeypatch.setenv("ORDER_TIMEOUT_SEC", "0")
+        try:
+            config.reset_settings()
+            assert config.get_settings().ORDER_TIMEOUT_SEC == 0
+            assert config.ORDER_TIMEOUT_SEC == 0
+            assert mgr.cleanup_stale_orders() >= 1
+            assert order_id not in {o["order_id"] for o in mgr.get_open_orders()}
+        finally:
+            monkeypatch.undo()
+            config.reset_settings()
+        assert config.ORDER_TIMEOUT_SEC == before
+
+
+# ---------------------------------------------------------------------------
+# Batched tick generator tests
+# ---------------------------------------------------------------------------
+
+from app.utils.data import TickBuffer, batched_tick_generator
+
+
+class TestBatchedTickGenerator:
+    """One generator replays every symbol's bars from a shared buffer."""
+
+    def _buffer(self):
+        # B.NS has one bar fewer than A.NS; its padding row is NaN
+        closes = np.array([[10.0, 20.0], [11.0, 21.0], [12.0, np.nan]])
+        volumes = np.array([[100.0, 200.0], [110.0, 210.0], [120.0, np.nan]])
+        return TickBuffer(
+            ("A.NS", "B.NS"),
+            opens=closes - 0.5,
+            highs=closes + 1.0,
+            lows=closes - 1.0,
+            closes=closes,
+            volumes=volumes,
+            lengths=np.array([3, 2]),
+        )
+
+    def _prices(self, bars):
+        return [[(t["symbol"], t["price"]) for t in bar] for bar in bars]
+
+    def test_yields_one_list_per_bar(self):
+        gen = batched_tick_generator(
+            self._buffer(), interval_sec=0, loop=False, stamp=False
+        )
+        bars = list(gen)
+        assert self._prices(bars) == [
+            [("A.NS", 10.0), ("B.NS", 20.0)],
+            [("A.NS", 11.0), ("B.NS", 21.0)],
+            [("A.NS", 12.0)],  # B.NS has run out of bars
+        ]
+        tick = bars[1][1]
+        assert tick["high"] == 22.0 and tick["low"] == 20.0
+        assert tick["volume"] == 210
+        assert "timestamp" not in tick
+        assert bars[0][0] is not bars[1][0]
+
+    def test_loop_wraps_each_symbol_at_its_own_length(self):
+        gen = batched_tick_generator(
+            self._buffer(), interval_sec=0, loop=True, stamp=False
+        )
+        bars = [next(gen) for _ in range(4)]
+        assert self._prices(bars) == [
+            [("A.NS", 10.0), ("B.NS", 20.0)],
+            [("A.NS", 11.0), ("B.NS", 21.0)],
+            [("A.NS", 12.0), ("B.NS", 20.0)],
+            [("A.NS", 10.0), ("B.NS", 21.0)],
+        ]
+
+
+# ---------------------------------------------------------------------------
+# SL/TP enforcement tests
+# ---------------------------------------------------------------------------
+
+
+def _reference_sl_tp(side, price, sl, tp):
+    """The per-position check check_sl_tp() vectorises."""
+    if price is None:
+        return None
+    if side == "BUY":
+        if price <= sl:
+            return "SL"
+        if price >= tp:
+            return "TP"
+    elif side == "SELL":
+        if price >= sl:
+            return "SL"
+        if price <= tp:
+            return "TP"
+    return None
+
+
+class TestCheckSlTp:
+    """Vectorised SL/TP check must match the per-position logic."""
+
+    def _make_manager(self):
+        cm = CapitalManager(initial_capital=1_000_000, account_id=_test_account_id())
+        return OrderManager(broker_submit_fn=lambda order: True, capital_mgr=cm)
+
+    def _open(self, mgr, symbol, side, price=100.0):
+        order = mgr.place_manual_order(symbol, side, 10, price)
+        mgr.update_order_status(order["order_id"], "ACK")
+        return mgr.update_order_status(
+            order["order_id"], "FILLED", filled_qty=10, avg_price=price
+        )
+
+    def _set_levels(self, mgr, order, sl, tp):
+        # No public API moves SL/TP; swap the cached order as a transition would
+        mgr._orders[order["order_id"]] = {**order, "stop_loss": sl, "take_profit": tp}
+        mgr._orders_rev += 1
+
+    def _hits(self, orders):
+        return {o["symbol"]: o["strategy"] for o in orders}
+
+    @pytest.mark.parametrize("side", ["BUY", "SELL"])
+    @pytest.mark.parametrize(
+        "price_of",
+        [
+            lambda sl, tp: min(sl, tp) - 1.0,
+            lambda sl, tp: sl,
+            lambda sl, tp: (sl + tp) / 2,
+            lambda sl, tp: tp,
+            lambda sl, tp: max(sl, tp) + 1.0,
+        ],
+        ids=["below", "at_sl", "between", "at_tp", "above"],
+    )
+    def test_matches_reference(self, side, price_of):
+        mgr = self._make_manager()
+        filled = self._open(mgr, "SLTP.NS", side)
+        sl, tp = filled["stop_loss"], filled["take_profit"]
+        price = price_of(sl, tp)
+
+        closing = mgr.check_sl_tp({"SLTP.NS": price})
+
+        expected = _reference_sl_tp(side, price, sl, tp)
+        if expected is None:
+            assert closing == []
+        else:
+            assert len(closing) == 1
+            close = closing[0]
+            assert close["strategy"] == f"auto_{expected.lower()}_exit"
+            assert close["side"] == ("SELL" if side == "BUY" else "BUY")
+            assert close["qty"] == 10
+            assert close["price"] == price
+
+    @pytest.mark.parametrize("side", ["BUY", "SELL"])
+    def test_sl_wins_when_both_levels_hit(self, side):
+        mgr = self._make_manager()
+        filled = self._open(mgr, "BOTH.NS", side)
+        # Crossed levels: 100 is past both the SL and the TP
+        if side == "BUY":
+            self._set_levels(mgr, filled, sl=105.0, tp=95.0)
+        else:
+            self._set_levels(mgr, filled, sl=95.0, tp=105.0)
+        assert _reference_sl_tp(side, 100.0, *(
+            (105.0, 95.0) if side == "BUY" else (95.0, 105.0)
+        )) == "SL"
+        assert self._hits(mgr.check_sl_tp({"BOTH.NS": 100.0})) == {
+            "BOTH.NS": "auto_sl_exit"
+        }
+
+    def test_missing_price_never_hits(self):
+        mgr = self._make_manager()
+        self._open(mgr, "NOPRICE.NS", "BUY")
+        filled = self._open(mgr, "PRICED.NS", "BUY")
+        closing = mgr.check_sl_tp({"PRICED.NS": filled["stop_loss"] - 1.0})
+        assert self._hits(closing) == {"PRICED.NS": "auto_sl_exit"}
+        assert mgr.check_sl_tp({}) == []
+
+    def test_cache_follows_positions_and_orders(self):
+        mgr = self._make_manager()
+        a = self._open(mgr, "CA.NS", "BUY")
+        assert mgr._sl_tp_arrays() is mgr._sl_tp_arrays()  # unchanged -> cached
+        assert mgr.check_sl_tp({"CA.NS": 100.0}) == []
+
+        # New position (positions_version bump) joins the arrays
+        b = self._open(mgr, "CB.NS", "SELL")
+        prices = {"CA.NS": 100.0, "CB.NS": b["stop_loss"] + 1.0}
+        assert self._hits(mgr.check_sl_tp(prices)) == {"CB.NS": "auto_sl_exit"}
+
+        # New levels on the reference order (_orders_rev bump) are picked up
+        self._set_levels(mgr, a, sl=101.0, tp=150.0)
+        hits = self._hits(mgr.check_sl_tp({"CA.NS": 100.0}))
+        assert hits == {"CA.NS": "auto_sl_exit"}
+
+
+# ---------------------------------------------------------------------------
+# PnL rollup tests
+# ---------------------------------------------------------------------------
+
+import sqlite3
+
+
+class TestPnlRollup:
+    """Per-minute PnL reads must include unrolled minutes without writing."""
+
+    def _conn(self):
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(
+            """
+            CREATE TABLE pnl_history (
+                timestamp TEXT, realised_pnl REAL, unrealised_pnl REAL,
+                total_pnl REAL, capital REAL);
+            CREATE TABLE pnl_1m (
+                bucket_ts INTEGER PRIMARY KEY, realised_pnl REAL,
+                unrealised_pnl REAL, total_pnl REAL, capital REAL);
+            """
+        )
+        return conn
+
+    def _snap(self, conn, hhmmss, total):
+        conn.execute(
+            "INSERT INTO pnl_history VALUES (?, 0, ?, ?, 1000)",
+            (f"2024-01-01T{hhmmss}.000000+00:00", total, total),
+        )
+
+    def _read(self, conn):
+        rows = conn.execute(storage._SQL_SELECT_PNL_1M, (10,)).fetchall()
+        return [(ts[11:16], total) for ts, _, _, total, _ in rows]
+
+    def test_select_before_any_rollup(self):
+        conn = self._conn()
+        self._snap(conn, "00:00:10", 1.0)
+        self._snap(conn, "00:00:50", 2.0)
+        self._snap(conn, "00:01:05", 3.0)
+        assert self._read(conn) == [("00:01", 3.0), ("00:00", 2.0)]
+
+    def test_select_merges_live_tail_without_writing(self):
+        conn = self._conn()
+        self._snap(conn, "00:00:10", 1.0)
+        self._snap(conn, "00:00:50", 2.0)
+        self._snap(conn, "00:01:05", 3.0)
+        conn.execute(storage._SQL_ROLLUP_PNL, ("",))
+        conn.commit()
+        # Minute 00:01 was rolled up while open; 00:02 not at all
+        self._snap(conn, "00:01:40", 4.0)
+        self._snap(conn, "00:02:03", 5.0)
+        conn.commit()
+        changes = conn.total_changes
+
+        rows = self._read(conn)
+
+        assert rows == [("00:02", 5.0), ("00:01", 4.0), ("00:00", 2.0)]
+        assert conn.total_changes == changes
+        assert conn.execute("SELECT COUNT(*) FROM pnl_1m").fetchone()[0] == 2
+
+
+# ---------------------------------------------------------------------------
+# Simulated broker tests
+# ---------------------------------------------------------------------------
+
+import asyncio
+import subprocess
+import textwrap
+import time
+
+from app.broker import simulated_broker
+from app.broker.simulated_broker import SimulatedBroker
+
+_DONE = ("FILLED", "REJECTED")
+
+# Mirrors app.main: monkey_patch() first, then the broker runs on green
+# threads sharing the hub with a greenlet that must keep being scheduled.
+_EVENTLET_BROKER_SCRIPT = textwrap.dedent(
+    """
+    import eventlet
+    eventlet.monkey_patch()
+
+    from app.broker import simulated_broker
+    from app.broker.simulated_broker import SimulatedBroker
+
+    simulated_broker._latencies = lambda n: [0.05] * n
+    hub_ticks = [0]
+
+    def spin():
+        while True:
+            hub_ticks[0] += 1
+            eventlet.sleep(0.01)
+
+    def run_order(broker):
+        oid = broker.place_order(
+            {"symbol": "EV.NS", "side": "BUY", "qty": 1, "price": 100.0}
+        )
+        for _ in range(200):
+            if broker.get_order_status(oid)["status"] in ("FILLED", "REJECTED"):
+                break
+            eventlet.sleep(0.02)
+        return broker.get_order_status(oid)["status"] in ("FILLED", "REJECTED")
+
+    eventlet.spawn(spin)
+    updates = []
+    broker = SimulatedBroker(on_update=updates.append)
+    broker.connect()
+    print("done" if run_order(broker) else "stuck")
+    print("hub" if hub_ticks[0] > 0 else "starved")
+    broker.disconnect()
+    broker.connect()
+    print("done" if run_order(broker) else "stuck")
+    broker.disconnect()
+    print(len(updates) >= 4)
+    """
+)
+
+
+class TestSimulatedBroker:
+    """Order scheduling across connect/disconnect and under eventlet."""
+
+    def _order(self):
+        return {"symbol": "SIM.NS", "side": "BUY", "qty": 1, "price": 100.0}
+
+    def _broker(self, monkeypatch):
+        monkeypatch.setattr(simulated_broker, "_latencies", lambda n: [0.0] * n)
+        return SimulatedBroker(on_update=lambda msg: None)
+
+    def _wait(self, broker, order_id, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = broker.get_order_status(order_id)["status"]
+            if status in _DONE:
+                return status
+            time.sleep(0.01)
+        return broker.get_order_status(order_id)["status"]
+
+    def test_order_after_disconnect_runs_on_reconnect(self, monkeypatch):
+        broker = self._broker(monkeypatch)
+        broker.connect()
+        broker.disconnect()
+
+        order_id = broker.place_order(self._order())
+        assert broker.get_order_status(order_id)["status"] == "NEW"
+
+        broker.connect()
+        try:
+            assert self._wait(broker, order_id) in _DONE
+        finally:
+            broker.disconnect()
+
+    def test_unschedulable_order_is_forgotten(self, monkeypatch):
+        broker = self._broker(monkeypatch)
+        closed = asyncio.new_event_loop()
+        closed.close()
+        monkeypatch.setattr(broker, "_open_loop", lambda: closed)
+
+        order = {**self._order(), "order_id": str(uuid.uuid4())}
+        with pytest.raises(RuntimeError):
+            broker.place_order(order)
+        status = broker.get_order_status(order["order_id"])["status"]
+        assert status == "NOT_FOUND"
+
+    def test_runs_under_eventlet_monkey_patch(self):
+        pytest.importorskip("eventlet")
+        result = subprocess.run(
+            [sys.executable, "-c", _EVENTLET_BROKER_SCRIPT],
+            cwd=_PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.split() == ["done", "hub", "done", "True"]